@@ -0,0 +1,204 @@
+"""
+Semantic answer cache for first-turn questions.
+
+Answered questions are embedded with the same dense model as retrieval and
+stored in a Qdrant collection together with the streamed answer chunks. A new
+first-turn question whose nearest cached question scores above the threshold,
+with the same selected collections, the same entities (states and numbers
+such as years) and within the TTL, is answered by replaying the cached chunks
+instead of running the RAG pipeline. The entity check keeps "policies in
+Kerala" from replaying the answer to "policies in Gujarat".
+
+Off by default; enable with ANSWER_CACHE=1.
+"""
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+from qdrant_client import models
+
+from singleflight import normalize_query
+
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE", "0") == "1"
+ANSWER_CACHE_COLLECTION = os.environ.get("ANSWER_CACHE_COLLECTION", "answer_cache")
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL_HOURS", "24")) * 3600
+
+DENSE_SIZE = 768  # BAAI/bge-base-en-v1.5
+# Schema fields whose listed values name entities a question can be about
+ENTITY_FIELDS = ("state", "state_name")
+NUMBER = re.compile(r"\b\d+\b")
+
+
+def collections_key(collections: List[str]) -> str:
+    return ",".join(sorted(set(collections)))
+
+
+def entity_terms(schemas: Dict) -> List[str]:
+    """Lower-cased listed values of the ENTITY_FIELDS in the collection schemas"""
+    terms = set()
+    for schema in schemas.values():
+        for name in ENTITY_FIELDS:
+            spec = schema.fields.get(name)
+            if spec is not None:
+                terms.update(value.lower() for value in spec.values if value)
+    return sorted(terms)
+
+
+class AnswerCache:
+    def __init__(self, qdrant_client, dense_model: str, model_options: dict,
+                 collection_name: str = ANSWER_CACHE_COLLECTION,
+                 threshold: float = ANSWER_CACHE_THRESHOLD, ttl: float = ANSWER_CACHE_TTL,
+                 enabled: bool = ANSWER_CACHE_ENABLED, entities: Iterable[str] = ()):
+        self.qdrant_client = qdrant_client
+        self.dense_model = dense_model
+        self.model_options = model_options
+        self.collection_name = collection_name
+        self.threshold = threshold
+        self.ttl = ttl
+        self.enabled = enabled
+        self.ready = False
+        self.lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        # Longest first so "west bengal" wins over a shorter overlapping term
+        terms = sorted(set(entities), key=len, reverse=True)
+        self.entity_pattern = re.compile(r"\b(" + "|".join(map(re.escape, terms)) + r")\b") if terms else None
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def _ensure_collection(self):
+        if self.ready:
+            return
+        with self.lock:
+            if self.ready:
+                return
+            if not self.qdrant_client.collection_exists(self.collection_name):
+                self.qdrant_client.create_collection(
+                    collection_name=self.collection_name,
+                    vectors_config={"dense": models.VectorParams(size=DENSE_SIZE, distance=models.Distance.COSINE)},
+                )
+                self.qdrant_client.create_payload_index(
+                    self.collection_name, "collections", models.PayloadSchemaType.KEYWORD
+                )
+                self.qdrant_client.create_payload_index(
+                    self.collection_name, "collection_names", models.PayloadSchemaType.KEYWORD
+                )
+                self.qdrant_client.create_payload_index(
+                    self.collection_name, "created_at", models.PayloadSchemaType.FLOAT
+                )
+            existing = self.qdrant_client.get_collection(self.collection_name).payload_schema or {}
+            if "entities" not in existing:
+                self.qdrant_client.create_payload_index(
+                    self.collection_name, "entities", models.PayloadSchemaType.KEYWORD
+                )
+            self.ready = True
+
+    def _document(self, query: str):
+        return models.Document(text=normalize_query(query), model=self.dense_model, options=self.model_options)
+
+    def entities_key(self, query: str) -> str:
+        """States and numbers mentioned in the question; cached answers must match them exactly"""
+        text = normalize_query(query)
+        found = set(NUMBER.findall(text))
+        if self.entity_pattern is not None:
+            found.update(self.entity_pattern.findall(text))
+        return "|".join(sorted(found))
+
+    def _count(self, name: str):
+        with self.stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def lookup(self, query: str, collections: List[str]) -> Optional[List[str]]:
+        """Cached answer chunks for a semantically equivalent question, or None"""
+        if not self.enabled:
+            return None
+        self._ensure_collection()
+        points = self.qdrant_client.query_points(
+            collection_name=self.collection_name,
+            query=self._document(query),
+            using="dense",
+            query_filter=models.Filter(must=[
+                models.FieldCondition(key="collections", match=models.MatchValue(value=collections_key(collections))),
+                models.FieldCondition(key="entities", match=models.MatchValue(value=self.entities_key(query))),
+                models.FieldCondition(key="created_at", range=models.Range(gte=time.time() - self.ttl)),
+            ]),
+            score_threshold=self.threshold,
+            limit=1,
+            with_payload=["chunks", "query"],
+        ).points
+        if not points:
+            self._count("misses")
+            return None
+        self._count("hits")
+        print(f"[DEBUG] Answer cache hit ({points[0].score:.3f}): {points[0].payload.get('query')}")
+        return points[0].payload["chunks"]
+
+    def store(self, query: str, collections: List[str], chunks: List[str]):
+        if not self.enabled or not chunks:
+            return
+        self._ensure_collection()
+        key = collections_key(collections)
+        # Same question + collections overwrites the previous entry
+        point_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{key}|{normalize_query(query)}"))
+        self.qdrant_client.upsert(
+            collection_name=self.collection_name,
+            points=[models.PointStruct(
+                id=point_id,
+                vector={"dense": self._document(query)},
+                payload={
+                    "query": query,
+                    "collections": key,
+                    "collection_names": sorted(set(collections)),
+                    "entities": self.entities_key(query),
+                    "chunks": chunks,
+                    "created_at": time.time(),
+                },
+            )],
+        )
+        self._count("stores")
+
+    def purge_expired(self) -> None:
+        """Delete entries older than the TTL"""
+        if not self.enabled:
+            return
+        self._ensure_collection()
+        self.qdrant_client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.FilterSelector(filter=models.Filter(must=[
+                models.FieldCondition(key="created_at", range=models.Range(lt=time.time() - self.ttl)),
+            ])),
+        )
+
+    def invalidate(self, collections: Optional[List[str]] = None) -> None:
+        """Drop cached answers, for the given collections or all of them (e.g. after re-indexing)"""
+        if not self.enabled:
+            return
+        self._ensure_collection()
+        if collections is None:
+            condition = models.Filter(must=[models.FieldCondition(key="created_at", range=models.Range(gte=0))])
+        else:
+            condition = models.Filter(must=[
+                models.FieldCondition(key="collection_names", match=models.MatchAny(any=list(collections)))
+            ])
+        self.qdrant_client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.FilterSelector(filter=condition),
+        )
+
+    def stats(self) -> dict:
+        with self.stats_lock:
+            hits, misses, stores = self.hits, self.misses, self.stores
+        total = hits + misses
+        return {
+            "enabled": self.enabled,
+            "hits": hits,
+            "misses": misses,
+            "stores": stores,
+            "hit_rate": hits / total if total else 0.0,
+            "threshold": self.threshold,
+            "ttl_s": self.ttl,
+        }
@@ -5,7 +5,7 @@ import { useChat } from '../context/ChatContext';
 import WelcomeScreen from './WelcomeScreen';
 
 const MessageList: React.FC = () => {
-  const { messages, isProcessing, currentStreamedMessage } = useChat();
+  const { messages, isProcessing, currentStreamedMessage, hasMoreMessages, loadOlderMessages } = useChat();
 
   useEffect(() => {
     console.log('Messages:', messages);
@@ -19,9 +19,19 @@ const MessageList: React.FC = () => {
   
   return (
     <div className="flex-1 overflow-y-auto">
+      {hasMoreMessages && (
+        <div className="flex justify-center py-2">
+          <button
+            onClick={loadOlderMessages}
+            className="text-sm text-gray-500 hover:text-gray-700 dark:text-gray-400 dark:hover:text-gray-200"
+          >
+            Load earlier messages
+          </button>
+        </div>
+      )}
       {messages.map((message, index) => (
         <Message
-          key={index}
+          key={message.id ?? `pending-${index}`}
           role={message.role}
           content={message.content}
           isStreaming={false}
@@ -1,10 +1,14 @@
-import React, { createContext, useContext, useState, useEffect, ReactNode } from 'react';
+import React, { createContext, useContext, useState, useEffect, useRef, ReactNode } from 'react';
 
 interface Message {
+  id?: number;
   role: 'user' | 'assistant';
   content: string;
 }
 
+// Newest messages fetched when opening a chat; older ones load on demand
+const HISTORY_PAGE_SIZE = 50;
+
 interface ChatContextType {
   messages: Message[];
   isProcessing: boolean;
@@ -12,6 +16,8 @@ interface ChatContextType {
   sendMessage: (message: string, selectedCollections: string[]) => Promise<void>;
   resetChat: () => void;
   loadChatHistory: () => Promise<void>;
+  loadOlderMessages: () => Promise<void>;
+  hasMoreMessages: boolean;
   error: string | null;
 }
 
@@ -30,12 +36,17 @@ export const ChatProvider: React.FC<{ chatId: string; children: React.ReactNode
   const [isProcessing, setIsProcessing] = useState(false);
   const [currentStreamedMessage, setCurrentStreamedMessage] = useState('');
   const [error, setError] = useState<string | null>(null);
+  const [hasMoreMessages, setHasMoreMessages] = useState(false);
+  const nextBeforeRef = useRef<number | null>(null);
+  const lastIdRef = useRef(0);
 
+  // The server sends ETags with Cache-Control: no-cache, so the browser
+  // revalidates these GETs and unchanged history comes back as a 304.
   const loadChatHistory = async () => {
     if (!chatId) return;
     try {
       setError(null);
-      const response = await fetch(`/api/chat_history/${chatId}`, {
+      const response = await fetch(`/api/chat_history/${chatId}?limit=${HISTORY_PAGE_SIZE}`, {
         credentials: 'include'
       });
       
@@ -50,14 +61,60 @@ export const ChatProvider: React.FC<{ chatId: string; children: React.ReactNode
       
       const data = await response.json();
       setMessages(data.messages || []);
+      setHasMoreMessages(Boolean(data.has_more));
+      nextBeforeRef.current = data.next_before ?? null;
+      lastIdRef.current = data.last_id ?? 0;
     } catch (error) {
       console.error('Error loading chat history:', error);
       setError('Failed to load chat history');
     }
   };
 
+  const loadOlderMessages = async () => {
+    if (!chatId || nextBeforeRef.current === null) return;
+    try {
+      const response = await fetch(
+        `/api/chat_history/${chatId}?limit=${HISTORY_PAGE_SIZE}&before=${nextBeforeRef.current}`,
+        { credentials: 'include' }
+      );
+      if (!response.ok) {
+        throw new Error('Failed to load older messages');
+      }
+      const data = await response.json();
+      setMessages(prev => [...(data.messages || []), ...prev]);
+      setHasMoreMessages(Boolean(data.has_more));
+      nextBeforeRef.current = data.next_before ?? null;
+    } catch (error) {
+      console.error('Error loading older messages:', error);
+      setError('Failed to load older messages');
+    }
+  };
+
+  // Fetch only messages newer than the last one we have, replacing the
+  // optimistic (id-less) entries with their stored versions
+  const loadNewMessages = async () => {
+    if (!chatId) return;
+    try {
+      const response = await fetch(`/api/chat_history/${chatId}/delta?after=${lastIdRef.current}`, {
+        credentials: 'include'
+      });
+      if (!response.ok) {
+        throw new Error('Failed to load new messages');
+      }
+      const data = await response.json();
+      setMessages(prev => [...prev.filter(m => m.id !== undefined), ...(data.messages || [])]);
+      lastIdRef.current = data.last_id ?? lastIdRef.current;
+    } catch (error) {
+      console.error('Error loading new messages:', error);
+      await loadChatHistory();
+    }
+  };
+
   // Load messages when chatId changes
   useEffect(() => {
+    setHasMoreMessages(false);
+    nextBeforeRef.current = null;
+    lastIdRef.current = 0;
     if (!chatId) {
       setMessages([]);
       return;
@@ -137,8 +194,8 @@ export const ChatProvider: React.FC<{ chatId: string; children: React.ReactNode
       setIsProcessing(false);
       setCurrentStreamedMessage('');
       if (!error) {
-        // Only reload history if there was no error
-        await loadChatHistory();
+        // Only fetch new messages if there was no error
+        await loadNewMessages();
       }
     }
   };
@@ -158,6 +215,8 @@ export const ChatProvider: React.FC<{ chatId: string; children: React.ReactNode
       sendMessage, 
       resetChat, 
       loadChatHistory,
+      loadOlderMessages,
+      hasMoreMessages,
       error 
     }}>
       {children}
@@ -0,0 +1,20 @@
+"""Helpers shared by the benchmark scripts"""
+import json
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET = os.path.join(ROOT, "evaluation", "test_dataset.json")
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def load_questions(path=DATASET):
+    with open(path) as f:
+        return [case["question"] for case in json.load(f)["test_cases"]]
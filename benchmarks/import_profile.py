@@ -0,0 +1,98 @@
+"""
+Import-time profile of the chat-serving path.
+
+Runs `python -X importtime -c "import server"` in a fresh interpreter and
+reports total import time, peak RSS, the slowest top-level imports, and
+whether any evaluation-only dependency was pulled in.
+
+    python -m benchmarks.import_profile
+    python -m benchmarks.import_profile --module benchmarks.stub_server --top 30
+"""
+import argparse
+import ast
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages that only /api/evaluate should need
+EVALUATION_ONLY = ["sentence_transformers", "sklearn", "pandas", "torch", "transformers", "matplotlib"]
+
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+PROBE = """
+import resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print("__PROBE__" + repr((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, sorted(sys.modules))))
+"""
+
+
+def profile(module):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module)],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            depth = (len(indent) - 1) // 2
+            entries.append({"module": name, "self_us": int(self_us), "cumulative_us": int(cumulative_us), "depth": depth})
+
+    probe = next(line for line in proc.stdout.splitlines() if line.startswith("__PROBE__"))
+    elapsed, max_rss_kb, loaded = ast.literal_eval(probe[len("__PROBE__"):])
+    return entries, elapsed, max_rss_kb, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile server import time")
+    parser.add_argument("--module", default="server")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    entries, elapsed, max_rss_kb, loaded = profile(args.module)
+    top_level = sorted((e for e in entries if e["depth"] == 0), key=lambda e: e["cumulative_us"], reverse=True)
+    loaded_roots = {name.split(".")[0] for name in loaded}
+    leaked = [name for name in EVALUATION_ONLY if name in loaded_roots]
+
+    print(f"=== Import profile: {args.module} ===")
+    print(f"Wall time: {elapsed:.3f}s  Peak RSS: {max_rss_kb / 1024:.1f} MiB  Modules loaded: {len(loaded)}")
+    print(f"{'module':<40}{'cumulative (ms)':>17}{'self (ms)':>12}")
+    for entry in top_level[:args.top]:
+        print(f"{entry['module']:<40}{entry['cumulative_us'] / 1000:>17.1f}{entry['self_us'] / 1000:>12.1f}")
+
+    if leaked:
+        print(f"❌ Evaluation-only packages imported at startup: {', '.join(leaked)}")
+    else:
+        print("✅ No evaluation-only packages imported at startup")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "module": args.module,
+                "wall_time_s": elapsed,
+                "max_rss_kb": max_rss_kb,
+                "modules_loaded": len(loaded),
+                "evaluation_only_loaded": leaked,
+                "top_level": top_level[:args.top],
+            }, f, indent=2)
+        print(f"Report saved to: {args.output}")
+
+    if leaked:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+End-to-end load test for server.py.
+
+Starts `benchmarks.stub_server:app` under uvicorn (stubbed HybridSearcher, so
+only the server's own overhead is measured), then simulates concurrent users:
+each user creates a chat via /api/new_chat and repeatedly streams /api/chat,
+mixed with /api/chats, /api/chat_history and /api/audio calls.
+
+    python -m benchmarks.load_test --users 50 --iterations 5
+    python -m benchmarks.load_test --url http://localhost:8000   # existing server
+
+Reports throughput, time-to-first-byte and full-response latency percentiles
+per endpoint, and the server's RSS growth over the run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import httpx
+
+from benchmarks.common import ROOT, percentile
+
+COLLECTIONS = ["best_practices", "policies", "data"]
+# Tiny WebM header, enough to pass the audio/* content-type check
+AUDIO_BYTES = b"\x1a\x45\xdf\xa3" + b"\x00" * 4096
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+def read_rss_kb(pid):
+    """Resident set size of a process in KiB (Linux only, None elsewhere)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Recorder:
+    """Collects latency samples and errors per endpoint"""
+
+    def __init__(self):
+        self.latency = defaultdict(list)
+        self.ttfb = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.requests = 0
+
+    def record(self, endpoint, elapsed, ttfb=None, ok=True):
+        self.requests += 1
+        if not ok:
+            self.errors[endpoint] += 1
+            return
+        self.latency[endpoint].append(elapsed)
+        if ttfb is not None:
+            self.ttfb[endpoint].append(ttfb)
+
+
+async def timed(recorder, endpoint, coro):
+    start = time.perf_counter()
+    try:
+        response = await coro
+        ok = response.status_code < 400
+    except httpx.HTTPError:
+        response, ok = None, False
+    recorder.record(endpoint, time.perf_counter() - start, ok=ok)
+    return response
+
+
+async def stream_chat(client, recorder, text):
+    start = time.perf_counter()
+    first = None
+    ok = True
+    try:
+        async with client.stream("POST", "/api/chat", json={"text": text, "collections": COLLECTIONS}) as response:
+            ok = response.status_code < 400
+            async for line in response.aiter_lines():
+                if first is None and line.startswith("data: "):
+                    first = time.perf_counter() - start
+    except httpx.HTTPError:
+        ok = False
+    recorder.record("/api/chat", time.perf_counter() - start, ttfb=first, ok=ok)
+
+
+async def simulate_user(base_url, recorder, iterations, mix):
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        response = await timed(recorder, "/api/new_chat", client.post("/api/new_chat"))
+        if response is None or response.status_code >= 400:
+            return
+        chat_id = response.json()["session_id"]
+        client.cookies.set("session_id", chat_id)
+
+        for i in range(iterations):
+            await stream_chat(client, recorder, f"load test question {i}")
+            if random.random() < mix["chats"]:
+                await timed(recorder, "/api/chats", client.get("/api/chats"))
+            if random.random() < mix["history"]:
+                await timed(recorder, "/api/chat_history", client.get(f"/api/chat_history/{chat_id}"))
+            if random.random() < mix["audio"]:
+                files = {"file": ("clip.webm", AUDIO_BYTES, "audio/webm")}
+                await timed(recorder, "/api/audio", client.post("/api/audio", files=files))
+
+
+async def wait_until_up(base_url, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                response = await client.get("/api/ready")
+                if response.status_code in (200, 404):  # 404: server predates /api/ready
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not come up within {timeout}s")
+
+
+def start_stub_server(port, workers, chunks, chunk_delay):
+    """Run the stubbed app in a scratch directory so chats.json and uploads/ stay untouched"""
+    workdir = tempfile.mkdtemp(prefix="rag-loadtest-")
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    env["STUB_CHUNKS"] = str(chunks)
+    env["STUB_CHUNK_DELAY"] = str(chunk_delay)
+    cmd = [
+        sys.executable, "-m", "uvicorn", "benchmarks.stub_server:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    proc = subprocess.Popen(cmd, cwd=workdir, env=env)
+    return proc, workdir
+
+
+def server_rss_kb(proc):
+    """RSS of the uvicorn process plus any worker children"""
+    total = read_rss_kb(proc.pid)
+    if total is None:
+        return None
+    try:
+        with open(f"/proc/{proc.pid}/task/{proc.pid}/children") as f:
+            children = f.read().split()
+    except OSError:
+        children = []
+    for child in children:
+        total += read_rss_kb(int(child)) or 0
+    return total
+
+
+async def run(args):
+    proc = workdir = None
+    base_url = args.url
+    if base_url is None:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        proc, workdir = start_stub_server(port, args.workers, args.chunks, args.chunk_delay)
+
+    try:
+        await wait_until_up(base_url)
+        rss_before = server_rss_kb(proc) if proc else None
+
+        recorder = Recorder()
+        mix = {"chats": args.chats_ratio, "history": args.history_ratio, "audio": args.audio_ratio}
+        semaphore = asyncio.Semaphore(args.concurrency or args.users)
+
+        async def limited_user():
+            async with semaphore:
+                await simulate_user(base_url, recorder, args.iterations, mix)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(limited_user() for _ in range(args.users)))
+        elapsed = time.perf_counter() - start
+
+        rss_after = server_rss_kb(proc) if proc else None
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "config": vars(args),
+        "duration_s": elapsed,
+        "total_requests": recorder.requests,
+        "throughput_rps": recorder.requests / elapsed if elapsed else 0.0,
+        "latency_s": {ep: summarize(v) for ep, v in recorder.latency.items()},
+        "ttfb_s": {ep: summarize(v) for ep, v in recorder.ttfb.items()},
+        "errors": dict(recorder.errors),
+        "rss_kb": {
+            "before": rss_before,
+            "after": rss_after,
+            "growth": (rss_after - rss_before) if rss_before and rss_after else None,
+        },
+    }
+
+
+def print_report(report):
+    print("=== server.py load test ===")
+    print(f"Duration: {report['duration_s']:.2f}s  Requests: {report['total_requests']}  "
+          f"Throughput: {report['throughput_rps']:.1f} req/s")
+    print(f"{'endpoint':<20}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for endpoint, stats in sorted(report["latency_s"].items()):
+        print(f"{endpoint:<20}{stats['count']:>7}{stats['p50']:>9.3f}{stats['p95']:>9.3f}"
+              f"{stats['p99']:>9.3f}{stats['max']:>9.3f}")
+    for endpoint, stats in report["ttfb_s"].items():
+        print(f"TTFB {endpoint}: p50={stats['p50']:.3f}s p95={stats['p95']:.3f}s p99={stats['p99']:.3f}s")
+    if report["errors"]:
+        print(f"Errors: {report['errors']}")
+    rss = report["rss_kb"]
+    if rss["before"] is not None:
+        print(f"Server RSS: {rss['before'] / 1024:.1f} MiB -> {rss['after'] / 1024:.1f} MiB "
+              f"(+{(rss['growth'] or 0) / 1024:.1f} MiB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the RAG FastAPI server")
+    parser.add_argument("--url", help="Target an already running server instead of the stubbed one")
+    parser.add_argument("--users", type=int, default=20, help="Number of simulated users")
+    parser.add_argument("--concurrency", type=int, default=0, help="Max users active at once (default: all)")
+    parser.add_argument("--iterations", type=int, default=5, help="Chat turns per user")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the stub server")
+    parser.add_argument("--chunks", type=int, default=8, help="Chunks streamed per stub answer")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Stub delay between chunks (s)")
+    parser.add_argument("--chats-ratio", type=float, default=0.5)
+    parser.add_argument("--history-ratio", type=float, default=0.5)
+    parser.add_argument("--audio-ratio", type=float, default=0.1)
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
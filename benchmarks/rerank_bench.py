@@ -0,0 +1,130 @@
+"""
+Is reranking the qna context worth it?
+
+For every question in evaluation/test_dataset.json the 50 fused candidates
+are fetched from `docs` (as HybridSearcher.search does in qna mode). They are
+reranked to the top-k and both contexts are compared:
+  - rerank time with a cold and a warm score cache
+  - context size (approximate tokens, or exact with --llm)
+  - with --llm: Gemini prefill time, measured as the latency of a
+    one-token completion over each context
+
+The net saving is the prefill time saved minus the cold rerank time.
+Without --llm only sizes and rerank cost are reported.
+
+Needs a running Qdrant server with `docs` ingested; --llm needs GENAI_KEY.
+
+    python -m benchmarks.rerank_bench
+    python -m benchmarks.rerank_bench --llm --top-k 8
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from qdrant_client import QdrantClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from test import HybridSearcher  # noqa: E402
+from reranker import RERANK_MODEL, Reranker  # noqa: E402
+from benchmarks.common import load_questions  # noqa: E402
+from benchmarks.retrieval_bench import make_searcher  # noqa: E402
+
+CANDIDATES = 50  # what search() fetches in qna mode
+LLM_MODEL = "gemini-2.0-flash"
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+class Prefill:
+    """Measures Gemini prompt processing as the latency of a one-token answer"""
+
+    def __init__(self, repeats: int):
+        from google import genai
+
+        self.client = genai.Client(api_key=os.environ.get("GENAI_KEY"))
+        self.repeats = repeats
+
+    def tokens(self, prompt: str) -> int:
+        return self.client.models.count_tokens(model=LLM_MODEL, contents=prompt).total_tokens
+
+    def seconds(self, prompt: str) -> float:
+        timings = []
+        for _ in range(self.repeats):
+            _, elapsed = timed(
+                self.client.models.generate_content,
+                model=LLM_MODEL,
+                contents=prompt,
+                config={"max_output_tokens": 1},
+            )
+            timings.append(elapsed)
+        return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rerank cost vs LLM prefill saved for qna context")
+    parser.add_argument("--top-k", type=int, default=10, help="Chunks kept after reranking")
+    parser.add_argument("--min-score", type=float, default=None, help="Also drop chunks scoring below this")
+    parser.add_argument("--model", default=RERANK_MODEL)
+    parser.add_argument("--llm", action="store_true", help="Measure real Gemini prefill (uses API quota)")
+    parser.add_argument("--llm-repeats", type=int, default=3)
+    parser.add_argument("--url", default=os.environ.get("QDRANT_URL", "http://localhost:6333"))
+    args = parser.parse_args()
+
+    searcher = make_searcher(QdrantClient(url=args.url))
+    reranker = Reranker(args.model, HybridSearcher.options, args.top_k, args.min_score, enabled=True)
+    prefill = Prefill(args.llm_repeats) if args.llm else None
+    reranker.rerank("load model", [{"text": "warm up"}])  # model load is not part of per-query cost
+
+    rows = []
+    for question in load_questions():
+        candidates = searcher.search_docs(question, None, CANDIDATES)
+        kept, cold = timed(reranker.rerank, question, candidates)
+        _, warm = timed(reranker.rerank, question, candidates)
+
+        full = searcher.docs_to_context(candidates, []) + question
+        short = searcher.docs_to_context(kept, []) + question
+        row = {
+            "question": question,
+            "chunks": (len(candidates), len(kept)),
+            "rerank_cold_ms": cold * 1000,
+            "rerank_warm_ms": warm * 1000,
+        }
+        if prefill:
+            row["tokens"] = (prefill.tokens(full), prefill.tokens(short))
+            row["prefill_ms"] = (prefill.seconds(full) * 1000, prefill.seconds(short) * 1000)
+        else:
+            row["tokens"] = (len(full) // 4, len(short) // 4)  # ~4 characters per token
+        rows.append(row)
+        print(f"{question[:60]:<62}{row['chunks'][0]:>3} -> {row['chunks'][1]:<3}"
+              f"{row['tokens'][0]:>8} -> {row['tokens'][1]:<7}{row['rerank_cold_ms']:>8.1f} ms")
+
+    if not rows:
+        return
+
+    def mean(key, i=None):
+        return statistics.mean(r[key] if i is None else r[key][i] for r in rows)
+
+    print(f"\n{len(rows)} questions, {args.model}, top_k={args.top_k}, min_score={args.min_score}")
+    label = "tokens" if prefill else "~tokens"
+    print(f"context {label}:     {mean('tokens', 0):>10.0f} -> {mean('tokens', 1):.0f}")
+    print(f"rerank cold / warm:  {mean('rerank_cold_ms'):>10.1f} / {mean('rerank_warm_ms'):.1f} ms")
+    if prefill:
+        saved = mean("prefill_ms", 0) - mean("prefill_ms", 1)
+        print(f"prefill:             {mean('prefill_ms', 0):>10.1f} -> {mean('prefill_ms', 1):.1f} ms")
+        print(f"net saving per query:{saved - mean('rerank_cold_ms'):>10.1f} ms "
+              f"(prefill saved {saved:.1f} ms, rerank {mean('rerank_cold_ms'):.1f} ms)")
+    else:
+        print("Run with --llm to measure prefill time saved.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Microbenchmarks for the HybridSearcher retrieval hot paths.
+
+Targets search_metadata, search_docs, docs_to_context, create_filter's JSON
+parsing and the bp_columns/pol_columns payload filtering, using synthetic
+payloads at 5, 50 and 500 points in an in-memory Qdrant.
+
+    python -m benchmarks.retrieval_bench                 # run and compare to baseline
+    python -m benchmarks.retrieval_bench --save          # run and store as new baseline
+    python -m benchmarks.retrieval_bench -k docs_to_context
+
+Results are stored in benchmarks/baselines/retrieval.json, keyed by benchmark
+name, so retrieval changes can be compared run over run.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from test import HybridSearcher  # noqa: E402
+
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "baselines", "retrieval.json")
+SCALES = [5, 50, 500]
+DENSE_DIM = 768  # BAAI/bge-base-en-v1.5
+SPARSE_VOCAB = 30522  # Splade_PP_en_v1 vocabulary size
+QUERY = "rainwater harvesting in rural districts"
+
+
+# -----------------------
+# Synthetic data
+# -----------------------
+
+def _words(rng, n):
+    return " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(n))
+
+
+def synthetic_payload(rng, collection_name, doc_id):
+    """Payload shaped like the real collections, including columns the server filters out"""
+    if collection_name == "best_practices":
+        payload = {column: _words(rng, 3) for column in HybridSearcher.bp_columns}
+        payload["brief_description"] = _words(rng, 80)
+        payload["year"] = rng.randint(2000, 2024)
+    elif collection_name == "policies":
+        payload = {column: _words(rng, 3) for column in HybridSearcher.pol_columns}
+        payload["description"] = _words(rng, 80)
+    elif collection_name == "docs":
+        return {"doc_id": doc_id, "text": _words(rng, 180), "page": rng.randint(1, 40)}
+    else:
+        return {"text": _words(rng, 60)}
+    payload["doc_id"] = doc_id
+    # Columns present in the source sheets but not in the allowed lists
+    payload.update({f"extra_{i}": _words(rng, 10) for i in range(12)})
+    payload["raw_text"] = _words(rng, 300)
+    return payload
+
+
+def random_sparse(rng, nnz=120):
+    indices = sorted(rng.sample(range(SPARSE_VOCAB), nnz))
+    return models.SparseVector(indices=indices, values=[rng.random() for _ in indices])
+
+
+def build_collection(client, rng, collection_name, size, doc_ids):
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config={"dense": models.VectorParams(size=DENSE_DIM, distance=models.Distance.COSINE)},
+        sparse_vectors_config={"sparse": models.SparseVectorParams()},
+    )
+    dense = np.random.default_rng(rng.randint(0, 2**32)).standard_normal((size, DENSE_DIM)).astype(np.float32)
+    points = [
+        models.PointStruct(
+            id=str(uuid.uuid4()),
+            vector={"dense": dense[i].tolist(), "sparse": random_sparse(rng)},
+            payload=synthetic_payload(rng, collection_name, doc_ids[i % len(doc_ids)]),
+        )
+        for i in range(size)
+    ]
+    client.upsert(collection_name=collection_name, points=points)
+    return points
+
+
+def make_searcher(client):
+    """HybridSearcher bound to the given Qdrant client, skipping Gemini chat setup"""
+    searcher = HybridSearcher.__new__(HybridSearcher)
+    searcher.qdrant_client = client
+    searcher.active_chat = None
+    searcher.chat_history = {}
+    return searcher
+
+
+class CannedQdrant:
+    """Returns pre-built points so only HybridSearcher's post-processing is timed"""
+
+    def __init__(self, points):
+        self.response = models.QueryResponse(points=[
+            models.ScoredPoint(id=p.id, version=0, score=1.0, payload=p.payload) for p in points
+        ])
+
+    def query_points(self, **kwargs):
+        return self.response
+
+
+class CannedLLM:
+    """Stands in for the Gemini client in create_filter"""
+
+    class _Models:
+        def __init__(self, text):
+            self.text = text
+
+        def generate_content(self, **kwargs):
+            return self
+
+    def __init__(self, text):
+        self.models = self._Models(text)
+
+
+FILTER_RESPONSE = json.dumps({
+    "vector_string": "rainwater harvesting",
+    "filter": {
+        "must_not": [{"key": "doc_id", "match": {"value": ""}}],
+        "must": [
+            {"key": "state", "match": {"value": "RAJASTHAN"}},
+            {"key": "sector", "match": {"text": "water"}},
+            {"key": "year", "range": {"gte": 2015}},
+        ],
+    },
+})
+
+
+# -----------------------
+# Runner
+# -----------------------
+
+def bench(fn, rounds, warmup, min_time):
+    """Time fn() pytest-benchmark style: warm up, then collect per-call wall times"""
+    timings = []
+    # HybridSearcher prints debug output on every call; keep it out of the timings
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(warmup):
+            fn()
+        started = time.perf_counter()
+        while len(timings) < rounds or time.perf_counter() - started < min_time:
+            t0 = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - t0)
+    return {
+        "rounds": len(timings),
+        "min": min(timings),
+        "max": max(timings),
+        "mean": statistics.fmean(timings),
+        "median": statistics.median(timings),
+        "stddev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def collect_benchmarks(seed):
+    """Build fixtures and return {name: zero-arg callable}"""
+    rng = random.Random(seed)
+    client = QdrantClient(":memory:")
+    doc_ids = [str(uuid.uuid4()) for _ in range(max(SCALES))]
+    benchmarks = {}
+
+    for size in SCALES:
+        built = {}
+        for collection_name in ["best_practices", "policies", "data", "docs"]:
+            built[collection_name] = build_collection(client, rng, f"{collection_name}_{size}", size, doc_ids)
+        # search_metadata picks columns by collection name, so keep the real
+        # names and route them to the sized collections.
+        live = make_searcher(_SizedRouter(client, size))
+
+        for collection_name in ["best_practices", "policies", "data"]:
+            benchmarks[f"search_metadata[{collection_name}-{size}]"] = (
+                lambda s=live, c=collection_name, n=size: s.search_metadata(QUERY, c, None, n)
+            )
+            canned = make_searcher(CannedQdrant(built[collection_name]))
+            benchmarks[f"payload_filter[{collection_name}-{size}]"] = (
+                lambda s=canned, c=collection_name, n=size: s.search_metadata(QUERY, c, None, n)
+            )
+
+        benchmarks[f"search_docs[{size}]"] = (
+            lambda s=live, ids=doc_ids[:size], n=size: s.search_docs(QUERY, ids, n)
+        )
+
+        docs = [p.payload for p in built["docs"]]
+        data = [p.payload for p in built["data"]]
+        benchmarks[f"docs_to_context[{size}]"] = lambda s=live, d=docs, dd=data: s.docs_to_context(d, dd)
+
+    parser = make_searcher(client)
+    parser.client = CannedLLM(FILTER_RESPONSE)
+    benchmarks["create_filter_parse"] = lambda: models.Filter(
+        **parser.create_filter(QUERY, HybridSearcher.bp_prompt)["filter"]
+    )
+    return benchmarks
+
+
+class _SizedRouter:
+    """Routes a collection name to its synthetic copy at the given scale"""
+
+    def __init__(self, client, size):
+        self.client = client
+        self.size = size
+
+    def query_points(self, **kwargs):
+        kwargs["collection_name"] = f"{kwargs['collection_name']}_{self.size}"
+        return self.client.query_points(**kwargs)
+
+
+# -----------------------
+# Baselines
+# -----------------------
+
+def load_baseline(path):
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return None
+
+
+def save_baseline(path, results):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "timestamp": datetime.now().isoformat(),
+            "machine": {"python": platform.python_version(), "platform": platform.platform()},
+            "benchmarks": results,
+        }, f, indent=2)
+
+
+def print_results(results, baseline):
+    previous = (baseline or {}).get("benchmarks", {})
+    print(f"{'benchmark':<40}{'median (ms)':>13}{'mean (ms)':>12}{'stddev':>10}{'rounds':>8}{'vs base':>10}")
+    for name, stats in results.items():
+        delta = ""
+        if name in previous:
+            change = (stats["median"] - previous[name]["median"]) / previous[name]["median"] * 100
+            delta = f"{change:+.1f}%"
+        print(f"{name:<40}{stats['median'] * 1000:>13.3f}{stats['mean'] * 1000:>12.3f}"
+              f"{stats['stddev'] * 1000:>10.3f}{stats['rounds']:>8}{delta:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HybridSearcher retrieval microbenchmarks")
+    parser.add_argument("-k", dest="keyword", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--min-time", type=float, default=0.5, help="Minimum seconds per benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save", action="store_true", help="Store results as the new baseline")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="Exit 1 if any median is slower than baseline by more than this percent")
+    args = parser.parse_args()
+
+    benchmarks = collect_benchmarks(args.seed)
+    results = {}
+    for name, fn in benchmarks.items():
+        if args.keyword and args.keyword not in name:
+            continue
+        results[name] = bench(fn, args.rounds, args.warmup, args.min_time)
+
+    baseline = load_baseline(args.baseline)
+    print_results(results, baseline)
+
+    if args.save:
+        merged = dict((baseline or {}).get("benchmarks", {}))
+        merged.update(results)
+        save_baseline(args.baseline, merged)
+        print(f"Baseline saved to: {args.baseline}")
+
+    if args.max_regression is not None and baseline:
+        regressions = [
+            name for name, stats in results.items()
+            if name in baseline["benchmarks"]
+            and stats["median"] > baseline["benchmarks"][name]["median"] * (1 + args.max_regression / 100)
+        ]
+        if regressions:
+            print(f"❌ Regressions over {args.max_regression}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Entry point that serves `server:app` with a stubbed HybridSearcher.
+
+Used by benchmarks/load_test.py so the numbers reflect the server's own
+overhead (routing, cookies, chats.json I/O, SSE framing) instead of Qdrant
+and Gemini latency.
+
+    uvicorn benchmarks.stub_server:app --port 8765
+"""
+import asyncio
+import os
+import sys
+import types
+import uuid
+import wave
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from singleflight import SingleFlight  # noqa: E402
+from reranker import Reranker  # noqa: E402
+
+# Tunables for the fake model, read from the environment so the load test
+# can pass them through to uvicorn workers.
+CHUNKS = int(os.environ.get("STUB_CHUNKS", "8"))
+CHUNK_DELAY = float(os.environ.get("STUB_CHUNK_DELAY", "0.0"))
+CHUNK_TEXT = os.environ.get("STUB_CHUNK_TEXT", "lorem ipsum dolor sit amet ")
+
+
+class StubHybridSearcher:
+    """Drop-in replacement for test.HybridSearcher that never leaves the process"""
+    bp_columns = []
+    pol_columns = []
+    schemas = {}
+
+    def __init__(self):
+        self.active_chat = None
+        self.chat_history = {}
+        self.active_chat = self.create_new_chat()
+
+    def create_new_chat(self, history: list = None) -> str:
+        chat_id = str(uuid.uuid4())
+        self.chat_history[chat_id] = list(history or [])
+        self.active_chat = chat_id
+        return chat_id
+
+    def drop_chats(self):
+        self.chat_history.clear()
+        self.active_chat = None
+
+    def switch_chat(self, chat_id: str) -> bool:
+        if chat_id in self.chat_history:
+            self.active_chat = chat_id
+            return True
+        return False
+
+    def get_active_chat(self):
+        return self.chat_history.get(self.active_chat)
+
+    def new_chat(self) -> str:
+        return self.create_new_chat()
+
+    def search_metadata(self, text, collection_name, filter=None, n=5):
+        return []
+
+    async def process_query(self, query, collections):
+        for _ in range(CHUNKS):
+            if CHUNK_DELAY:
+                await asyncio.sleep(CHUNK_DELAY)
+            # Same shape as Gemini's stream chunks; dicts are the error path
+            yield SimpleNamespace(text=CHUNK_TEXT)
+
+    def send_audio(self, audio_bytes: bytes, mime_type: str = "audio/webm"):
+        return "stub transcript"
+
+    def tts_stream(self, message, voice_name="Charon"):
+        for _ in range(4):
+            yield b"\x00\x00" * 2400
+
+    def tts(self, message, file_name, voice_name="Charon"):
+        with wave.open(file_name, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(24000)
+            wf.writeframes(b"\x00\x00" * 2400)
+        return file_name
+
+
+class StubRAGMetrics:
+    """Avoids loading SentenceTransformer in every benchmark worker"""
+
+    def semantic_similarity(self, generated: str, expected: str) -> float:
+        return 0.0
+
+
+def install_stubs():
+    """Register stub modules before `server` is imported"""
+    stub_test = types.ModuleType("test")
+    stub_test.HybridSearcher = StubHybridSearcher
+    stub_test.flights = SingleFlight()
+    stub_test.qdrant = None
+    stub_test.reranker = Reranker(enabled=False)
+    # The answer cache needs a real Qdrant; keep it out of server overhead numbers
+    os.environ.setdefault("ANSWER_CACHE", "0")
+    sys.modules["test"] = stub_test
+
+    stub_metrics = types.ModuleType("evaluation.metrics")
+    stub_metrics.RAGMetrics = StubRAGMetrics
+    sys.modules["evaluation.metrics"] = stub_metrics
+
+
+install_stubs()
+
+from server import app  # noqa: E402
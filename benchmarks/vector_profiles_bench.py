@@ -0,0 +1,156 @@
+"""
+Compares the vector storage profiles in vector_profiles.py on real data.
+
+The dense vectors of an existing collection (default `docs`) are copied into
+one scratch collection per profile. The questions in
+evaluation/test_dataset.json are then run against each copy. Reported per
+profile:
+  - est. RAM: resident size of dense vectors + HNSW links implied by the
+    profile (originals on disk are not counted; the OS page cache may still
+    hold them)
+  - p50/p95 query latency over --repeats runs of every question
+  - recall@k against exact (brute-force, unquantized) search over the same
+    points
+
+Needs a running Qdrant server with the collection ingested (see ingest.py).
+
+    python -m benchmarks.vector_profiles_bench
+    python -m benchmarks.vector_profiles_bench --collection best_practices --profiles baseline scalar -k 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from qdrant_client import QdrantClient, models
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from test import HybridSearcher  # noqa: E402
+from vector_profiles import DENSE_VECTOR, PROFILES  # noqa: E402
+from benchmarks.common import load_questions, percentile  # noqa: E402
+
+
+def embed_questions(questions):
+    from fastembed import TextEmbedding
+
+    model = TextEmbedding(model_name=HybridSearcher.DENSE_MODEL, **HybridSearcher.options)
+    return [vector.tolist() for vector in model.embed(questions)]
+
+
+def copy_collection(client, source, target, profile, dim, limit=None):
+    """Copy the dense vectors of `source` into a fresh `target` configured with `profile`"""
+    if client.collection_exists(target):
+        client.delete_collection(target)
+    client.create_collection(
+        collection_name=target,
+        vectors_config={DENSE_VECTOR: profile.vector_params(dim)},
+        hnsw_config=profile.hnsw_config(),
+        quantization_config=profile.quantization_config(),
+        # Build the HNSW graph even for small collections so m/ef matter
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=1),
+    )
+    copied = 0
+    offset = None
+    while limit is None or copied < limit:
+        points, offset = client.scroll(
+            collection_name=source, limit=256, offset=offset, with_payload=False, with_vectors=[DENSE_VECTOR],
+        )
+        if limit is not None:
+            points = points[:limit - copied]
+        if points:
+            client.upsert(target, points=[
+                models.PointStruct(id=p.id, vector={DENSE_VECTOR: p.vector[DENSE_VECTOR]}) for p in points
+            ])
+            copied += len(points)
+        if offset is None:
+            break
+
+    # Wait for the optimizer to finish indexing / quantizing
+    while client.get_collection(target).status != models.CollectionStatus.GREEN:
+        time.sleep(1)
+    return copied
+
+
+def top_ids(client, collection, vector, k, params):
+    points = client.query_points(
+        collection_name=collection, query=vector, using=DENSE_VECTOR, limit=k,
+        search_params=params, with_payload=False,
+    ).points
+    return [p.id for p in points]
+
+
+# Brute force over the original vectors, ignoring any quantization
+EXACT = models.SearchParams(exact=True, quantization=models.QuantizationSearchParams(ignore=True))
+
+
+def run_profile(client, target, profile, vectors, k, repeats):
+    truth = [top_ids(client, target, vector, k, EXACT) for vector in vectors]
+    params = profile.search_params()
+    for vector in vectors:  # warm caches before timing
+        top_ids(client, target, vector, k, params)
+
+    timings = []
+    recalls = []
+    for vector, expected in zip(vectors, truth):
+        for _ in range(repeats):
+            started = time.perf_counter()
+            ids = top_ids(client, target, vector, k, params)
+            timings.append(time.perf_counter() - started)
+        recalls.append(len(set(ids) & set(expected)) / len(expected) if expected else 1.0)
+    return {
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+        "recall": statistics.mean(recalls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory, latency and recall of the vector storage profiles")
+    parser.add_argument("--collection", default="docs")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument("-k", type=int, default=10, help="Results per query (recall@k)")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed runs per question")
+    parser.add_argument("--limit", type=int, default=None, help="Copy at most this many points")
+    parser.add_argument("--url", default=os.environ.get("QDRANT_URL", "http://localhost:6333"))
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch collections")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = parser.parse_args()
+
+    client = QdrantClient(url=args.url)
+    questions = load_questions()
+    vectors = embed_questions(questions)
+    dim = len(vectors[0])
+
+    results = {}
+    for name in args.profiles:
+        profile = PROFILES[name]
+        target = f"{args.collection}_profile_{name}"
+        print(f"Building {target}...")
+        points = copy_collection(client, args.collection, target, profile, dim, args.limit)
+        try:
+            stats = run_profile(client, target, profile, vectors, args.k, args.repeats)
+        finally:
+            if not args.keep:
+                client.delete_collection(target)
+        stats["est_ram_mb"] = profile.estimated_ram_bytes(points, dim) / 1e6
+        stats["points"] = points
+        results[name] = stats
+
+    print(f"\n{len(questions)} questions, recall@{args.k} vs exact search, copied from '{args.collection}'")
+    print(f"{'profile':<14}{'points':>9}{'est. RAM (MB)':>15}{'p50 (ms)':>10}{'p95 (ms)':>10}{'recall':>9}")
+    for name, stats in results.items():
+        print(f"{name:<14}{stats['points']:>9}{stats['est_ram_mb']:>15.1f}{stats['p50_ms']:>10.2f}"
+              f"{stats['p95_ms']:>10.2f}{stats['recall']:>9.3f}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"collection": args.collection, "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Keeps Gemini chat history bounded as conversations grow.
+
+After every turn the chat history is rewritten so that:
+  - the last CONTEXT_KEEP_TURNS turns stay verbatim,
+  - older tool results (docs_to_context dumps, search_docs payloads) are
+    replaced by a compact reference listing only their doc_ids,
+  - older text messages are cut to CONTEXT_OLD_TEXT_CHARS characters,
+  - without summarization, only the last CONTEXT_MAX_TURNS turns are kept,
+  - optionally, once CONTEXT_SUMMARIZE_AFTER older turns pile up, they are
+    summarized in the background and replaced by a single summary turn.
+"""
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from google.genai import types
+
+from llm_scheduler import Priority, llm_priority, scheduler
+
+CONTEXT_KEEP_TURNS = int(os.environ.get("CONTEXT_KEEP_TURNS", "4"))
+CONTEXT_MAX_TURNS = int(os.environ.get("CONTEXT_MAX_TURNS", "20"))
+CONTEXT_OLD_TEXT_CHARS = int(os.environ.get("CONTEXT_OLD_TEXT_CHARS", "1000"))
+CONTEXT_SUMMARIZE = os.environ.get("CONTEXT_SUMMARIZE", "0") == "1"
+CONTEXT_SUMMARIZE_AFTER = int(os.environ.get("CONTEXT_SUMMARIZE_AFTER", "8"))
+CONTEXT_SUMMARY_MODEL = os.environ.get("CONTEXT_SUMMARY_MODEL", "gemini-2.0-flash")
+
+SUMMARY_PREFIX = "[Summary of earlier conversation]"
+COMPACT_MARKER = "[compacted]"
+TRUNCATED_MARKER = " [truncated]"
+# doc_ids contain at least one digit, so placeholder text like
+# "Document not available in local database." is never picked up
+DOC_ID_PATTERN = re.compile(r"doc_id\W+((?=[\w-]*\d)[0-9A-Za-z][\w-]{7,})")
+MAX_DOC_IDS = 50
+
+# Summaries run here so they never hold up a response
+summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="summarize")
+
+
+def is_user_text(content) -> bool:
+    """A user turn starts with a text message, not a function response"""
+    return content.role == "user" and any(part.text for part in content.parts or [])
+
+
+def split_turns(history):
+    """Split history into (summary contents or None, list of turns)"""
+    summary = None
+    turns = []
+    for content in history:
+        if is_user_text(content):
+            text = next(part.text for part in content.parts if part.text)
+            if text.startswith(SUMMARY_PREFIX) and summary is None and not turns:
+                summary = [content]
+            else:
+                turns.append([content])
+        elif turns:
+            turns[-1].append(content)
+        elif summary is not None:
+            summary.append(content)
+    return summary, turns
+
+
+def doc_ids_in(result) -> list:
+    seen = []
+    for doc_id in DOC_ID_PATTERN.findall(str(result)):
+        if doc_id not in seen:
+            seen.append(doc_id)
+        if len(seen) >= MAX_DOC_IDS:
+            break
+    return seen
+
+
+def compact_turn(turn, max_chars: int = CONTEXT_OLD_TEXT_CHARS):
+    """Replace function responses in a turn with doc_id references and cut long text. Returns (turn, changed)."""
+    compacted = []
+    changed = False
+    for content in turn:
+        parts = []
+        for part in content.parts or []:
+            response = part.function_response
+            if part.text and len(part.text) > max_chars and not part.text.endswith(TRUNCATED_MARKER):
+                part = types.Part(text=part.text[:max_chars] + TRUNCATED_MARKER)
+                changed = True
+            elif response is not None:
+                result = (response.response or {}).get("result", "")
+                if not str(result).startswith(COMPACT_MARKER):
+                    ids = doc_ids_in(result)
+                    reference = f"{COMPACT_MARKER} Earlier search results. doc_ids: {', '.join(ids) if ids else 'none'}"
+                    part = types.Part.from_function_response(name=response.name, response={"result": reference})
+                    changed = True
+            parts.append(part)
+        compacted.append(types.Content(role=content.role, parts=parts))
+    return compacted, changed
+
+
+def transcript(summary, turns) -> str:
+    """Plain-text rendering of turns for the summarizer (tool output omitted)"""
+    lines = []
+    for content in (summary or []) + [c for turn in turns for c in turn]:
+        for part in content.parts or []:
+            if part.text:
+                lines.append(f"{content.role}: {part.text}")
+    return "\n".join(lines)
+
+
+class ContextManager:
+    def __init__(self, client, keep_turns: int = CONTEXT_KEEP_TURNS, summarize: bool = CONTEXT_SUMMARIZE,
+                 summarize_after: int = CONTEXT_SUMMARIZE_AFTER, max_turns: int = CONTEXT_MAX_TURNS,
+                 old_text_chars: int = CONTEXT_OLD_TEXT_CHARS):
+        self.client = client
+        self.keep_turns = keep_turns
+        self.summarize = summarize
+        self.summarize_after = summarize_after
+        self.max_turns = max(max_turns, keep_turns)
+        self.old_text_chars = old_text_chars
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.dropped = set()  # forgotten chats whose summary is still running
+        self.finished = {}  # chat_id -> (number of turns covered, summary text)
+
+    def compact(self, chat_id: str, history: list):
+        """Return a bounded version of `history`, or None if nothing needs to change"""
+        summary, turns = split_turns(history)
+        if len(turns) <= self.keep_turns:
+            return None
+        old, recent = turns[:-self.keep_turns], turns[-self.keep_turns:]
+        changed = False
+
+        with self.lock:
+            done = self.finished.pop(chat_id, None)
+        if done is not None and done[0] <= len(old):
+            covered, text = done
+            summary = [
+                types.Content(role="user", parts=[types.Part(text=f"{SUMMARY_PREFIX}\n{text}")]),
+                types.Content(role="model", parts=[types.Part(text="Understood.")]),
+            ]
+            old = old[covered:]
+            changed = True
+
+        if self.summarize and len(old) >= self.summarize_after:
+            self._schedule_summary(chat_id, summary, old)
+        elif not self.summarize and len(old) > self.max_turns - self.keep_turns:
+            # No summary will replace them, so the oldest turns are dropped
+            old = old[len(old) - (self.max_turns - self.keep_turns):]
+            changed = True
+
+        compacted_old = []
+        for turn in old:
+            turn, turn_changed = compact_turn(turn, self.old_text_chars)
+            changed = changed or turn_changed
+            compacted_old.append(turn)
+
+        if not changed:
+            return None
+        return (summary or []) + [c for turn in compacted_old + recent for c in turn]
+
+    def _schedule_summary(self, chat_id, summary, turns):
+        with self.lock:
+            if chat_id in self.pending:
+                return
+            self.pending.add(chat_id)
+        summary_executor.submit(self._summarize, chat_id, transcript(summary, turns), len(turns))
+
+    def _summarize(self, chat_id, text, covered):
+        try:
+            with llm_priority(Priority.BACKGROUND):
+                response = scheduler.call(
+                    CONTEXT_SUMMARY_MODEL,
+                    self.client.models.generate_content,
+                    model=CONTEXT_SUMMARY_MODEL,
+                    contents="Summarize this conversation between a user and an assistant in a few sentences. "
+                             "Keep names of practices, policies, states and any doc_ids mentioned.\n\n" + text,
+                )
+            with self.lock:
+                if chat_id not in self.dropped:
+                    self.finished[chat_id] = (covered, response.text)
+        except Exception as e:
+            print(f"[ERROR] Summarizing chat {chat_id} failed: {str(e)}")
+        finally:
+            with self.lock:
+                self.pending.discard(chat_id)
+                self.dropped.discard(chat_id)
+
+    def forget(self, chat_id: str):
+        """Drop a chat's finished summary, and the result of one still running"""
+        with self.lock:
+            self.finished.pop(chat_id, None)
+            if chat_id in self.pending:
+                self.dropped.add(chat_id)
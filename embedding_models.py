@@ -0,0 +1,13 @@
+"""
+fastembed models used for retrieval, ingestion and the answer cache.
+
+Kept out of test.py so modules that only need the model names (and the
+benchmark stub server, which replaces test.py) don't depend on HybridSearcher.
+"""
+import os
+
+DENSE_MODEL = "BAAI/bge-base-en-v1.5"
+SPARSE_MODEL = "prithivida/Splade_PP_en_v1"
+MODEL_OPTIONS = {"cache_dir": "./models"}
+if os.environ.get("ONNX_THREADS"):
+    MODEL_OPTIONS["threads"] = int(os.environ["ONNX_THREADS"])  # ONNX Runtime intra-op threads per model
@@ -1,7 +1,15 @@
+import argparse
 import json
+import os
 import pandas as pd
 import matplotlib.pyplot as plt
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from evaluation.history import HISTORY_DIR, load_history
+
+# Score the trends are drawn for, per history mode
+DEFAULT_METRICS = {"answer": "semantic_similarity", "retrieval": "recall@10"}
+TREND_COLUMNS = ["run_id", "timestamp", "config_hash", "type", "difficulty", "metric", "value"]
 
 def generate_evaluation_dashboard():
     """Generate simple evaluation dashboard"""
@@ -28,5 +36,94 @@ def generate_evaluation_dashboard():
     except FileNotFoundError:
         print("No evaluation report found. Run evaluation first.")
 
+def run_trends(df: pd.DataFrame, metric: str) -> pd.DataFrame:
+    """One row per run: mean score and p50/p95 end-to-end latency"""
+    scores = df[df["metric"] == metric].groupby("run_id").agg(
+        timestamp=("timestamp", "first"), config_hash=("config_hash", "first"), score=("value", "mean"),
+        cases=("value", "size"),
+    )
+    latency = df[df["metric"] == "latency_ms.total"].groupby("run_id")["value"]
+    scores["p50_ms"] = latency.median()
+    scores["p95_ms"] = latency.quantile(0.95)
+    return scores.sort_values("timestamp")
+
+def group_regressions(df: pd.DataFrame, metric: str, by: str, baseline_runs: int = 5) -> pd.DataFrame:
+    """Latest run vs the mean of the previous `baseline_runs` runs, per value of `by`"""
+    runs = df[df["metric"] == metric].groupby("run_id")["timestamp"].first().sort_values()
+    if len(runs) < 2:
+        return pd.DataFrame()
+    latest, previous = runs.index[-1], runs.index[-1 - baseline_runs:-1]
+    scored = df[df["metric"] == metric]
+    now = scored[scored["run_id"] == latest].groupby(by)["value"].mean()
+    before = scored[scored["run_id"].isin(previous)].groupby(by)["value"].mean()
+    table = pd.DataFrame({"latest": now, "baseline": before}).dropna()
+    table["change"] = table["latest"] - table["baseline"]
+    return table.sort_values("change")
+
+def stage_p95(df: pd.DataFrame) -> pd.DataFrame:
+    """p95 latency per stage (columns) for every run (rows)"""
+    latency = df[df["metric"].str.startswith("latency_ms.")]
+    p95 = latency.groupby(["run_id", "metric"])["value"].quantile(0.95).unstack("metric")
+    p95.columns = [c[len("latency_ms."):] for c in p95.columns]
+    started = latency.groupby("run_id")["timestamp"].first()
+    return p95.assign(timestamp=started).sort_values("timestamp").set_index("timestamp")
+
+def generate_trend_dashboard(mode: str = "answer", metric: str = None, days: int = 90, runs: int = 20,
+                             threshold: float = 0.05, plot: str = None):
+    """Score and latency trends across runs in the evaluation history"""
+    if not os.path.isdir(HISTORY_DIR):
+        print("No evaluation history found. Run evaluation first.")
+        return
+    metric = metric or DEFAULT_METRICS.get(mode, "semantic_similarity")
+    since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    # Only the needed columns, date partitions and metrics are read
+    df = load_history(since=since, mode=mode, metrics=[metric, "latency_ms."], columns=TREND_COLUMNS).to_pandas()
+    if df.empty:
+        print(f"No {mode} runs in the last {days} days.")
+        return
+
+    trends = run_trends(df, metric)
+    print(f"\n=== {mode.title()} Evaluation Trends ({len(trends)} runs, last {days} days) ===")
+    print(f"{'run':<20}{'config':<14}{'cases':>6}{metric:>22}{'p50 (ms)':>10}{'p95 (ms)':>10}")
+    for _, row in trends.tail(runs).iterrows():
+        print(f"{row['timestamp']:%Y-%m-%d %H:%M}    {row['config_hash']:<14}{row['cases']:>6}"
+              f"{row['score']:>22.3f}{row['p50_ms']:>10.0f}{row['p95_ms']:>10.0f}")
+
+    for by in ("type", "difficulty"):
+        table = group_regressions(df, metric, by)
+        if table.empty:
+            continue
+        print(f"\n{metric} by {by}, latest run vs previous runs:")
+        for group, row in table.iterrows():
+            flag = "❌" if row["change"] < -threshold else "  "
+            print(f"  {flag} {str(group):<20}{row['latest']:.3f}  (baseline {row['baseline']:.3f}, {row['change']:+.3f})")
+
+    stages = stage_p95(df)
+    if not stages.empty:
+        print("\np95 latency per stage (ms):")
+        print(stages.tail(runs).round(1).to_string())
+
+    if plot:
+        fig, (score_ax, latency_ax) = plt.subplots(2, 1, sharex=True, figsize=(10, 6))
+        score_ax.plot(trends["timestamp"], trends["score"], marker="o")
+        score_ax.set_ylabel(metric)
+        latency_ax.plot(stages.index, stages, marker=".")
+        latency_ax.legend(stages.columns, fontsize="small")
+        latency_ax.set_ylabel("p95 latency (ms)")
+        fig.autofmt_xdate()
+        fig.savefig(plot)
+        print(f"\nTrend chart saved to: {plot}")
+
 if __name__ == "__main__":
-    generate_evaluation_dashboard()
+    parser = argparse.ArgumentParser(description="Evaluation dashboard")
+    parser.add_argument("--mode", default="answer", choices=["answer", "retrieval"])
+    parser.add_argument("--metric", help="Score to trend (default: semantic_similarity / recall@10)")
+    parser.add_argument("--days", type=int, default=90, help="How far back to read the history")
+    parser.add_argument("--runs", type=int, default=20, help="Runs shown in the tables")
+    parser.add_argument("--threshold", type=float, default=0.05, help="Score drop flagged as a regression")
+    parser.add_argument("--plot", help="Save score and latency trend charts to this image file")
+    args = parser.parse_args()
+
+    if args.mode == "answer":
+        generate_evaluation_dashboard()
+    generate_trend_dashboard(args.mode, args.metric, args.days, args.runs, args.threshold, args.plot)
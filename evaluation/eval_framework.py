@@ -1,8 +1,9 @@
 from test import HybridSearcher
+from llm_scheduler import Priority, llm_priority
 import json
 import asyncio
+import time
 from typing import List, Dict
-import pandas as pd
 from datetime import datetime
 
 class RAGEvaluator:
@@ -16,17 +17,21 @@ class RAGEvaluator:
     
     async def evaluate_single_query(self, question: str, expected_answer: str, collections: List[str]):
         """Evaluate a single query through your RAG pipeline"""
-        response_stream = self.searcher.process_query(question, collections)
-        
-        full_response = ""
-        async for chunk in response_stream:
-            if hasattr(chunk, 'text'):
-                full_response += chunk.text
+        started = time.perf_counter()
+        # Queue evaluation LLM calls behind interactive chat traffic
+        with llm_priority(Priority.BACKGROUND):
+            response_stream = self.searcher.process_query(question, collections)
+            
+            full_response = ""
+            async for chunk in response_stream:
+                if hasattr(chunk, 'text'):
+                    full_response += chunk.text
         
         return {
             "question": question,
             "expected_answer": expected_answer,
             "generated_answer": full_response,
             "collections_used": collections,
+            "latency_ms": (time.perf_counter() - started) * 1000,
             "timestamp": datetime.now().isoformat()
         }
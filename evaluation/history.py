@@ -0,0 +1,154 @@
+"""
+Columnar history of evaluation runs.
+
+Every run (answer evaluation or retrieval-only) is appended to a Parquet
+dataset under evaluation/history/, hive-partitioned by date:
+
+    evaluation/history/date=2025-08-19/<run_id>-0.parquet
+
+Rows are long-format, one per (run, test case, measurement):
+
+    run_id, timestamp, mode, config_hash, question, type, difficulty, metric, value
+
+Scores use their own names (semantic_similarity, recall@10, mrr, ...), and
+latencies are stored as `latency_ms.<stage>`. Adding a metric never changes the
+schema, and the dashboard reads only the columns and date partitions it needs.
+"""
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Optional
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+HISTORY_DIR = os.environ.get("EVAL_HISTORY_DIR", "evaluation/history")
+
+# Repeated strings are dictionary-encoded by Parquet on disk
+SCHEMA = pa.schema([
+    ("run_id", pa.string()),
+    ("timestamp", pa.timestamp("us")),
+    ("mode", pa.string()),
+    ("config_hash", pa.string()),
+    ("question", pa.string()),
+    ("type", pa.string()),
+    ("difficulty", pa.string()),
+    ("metric", pa.string()),
+    ("value", pa.float64()),
+])
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+
+def current_config() -> dict:
+    """Settings that change what an evaluation measures"""
+    from test import HybridSearcher
+    from context_manager import CONTEXT_KEEP_TURNS, CONTEXT_MAX_TURNS, CONTEXT_OLD_TEXT_CHARS, CONTEXT_SUMMARIZE
+    from reranker import RERANK_ENABLED, RERANK_MIN_SCORE, RERANK_MODEL, RERANK_TOP_K
+    from vector_profiles import profile_for
+
+    return {
+        "dense_model": HybridSearcher.DENSE_MODEL,
+        "sparse_model": HybridSearcher.SPARSE_MODEL,
+        "vector_profiles": {name: profile_for(name).name for name in ("best_practices", "policies", "data", "docs")},
+        "rerank": {"enabled": RERANK_ENABLED, "model": RERANK_MODEL, "top_k": RERANK_TOP_K, "min_score": RERANK_MIN_SCORE},
+        "context": {"keep_turns": CONTEXT_KEEP_TURNS, "max_turns": CONTEXT_MAX_TURNS,
+                    "old_text_chars": CONTEXT_OLD_TEXT_CHARS, "summarize": CONTEXT_SUMMARIZE},
+    }
+
+
+def answer_config(collections_per_case) -> dict:
+    """
+    Config of an answer evaluation: current_config() plus every collection the
+    cases queried, so run_evaluation.py and /api/evaluate hash the same
+    settings the same way.
+    """
+    used = sorted({name for collections in collections_per_case for name in collections})
+    return {**current_config(), "collections": used}
+
+
+def config_hash(config: dict) -> str:
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+
+
+def append_run(results: list, mode: str, config: Optional[dict] = None, directory: str = HISTORY_DIR) -> str:
+    """
+    Append one run to the history and return its run_id.
+
+    `results` are the per-case dicts of a report: numeric values at the top
+    level or under "scores" become score rows, and "latency_ms" (a number or a
+    {stage: ms} dict) becomes latency rows.
+    """
+    run_id = uuid.uuid4().hex
+    now = datetime.now()
+    digest = config_hash(config if config is not None else current_config())
+
+    columns = {name: [] for name in SCHEMA.names}
+
+    def add(case, metric, value):
+        columns["question"].append(case.get("question"))
+        columns["type"].append(case.get("type"))
+        columns["difficulty"].append(case.get("difficulty"))
+        columns["metric"].append(metric)
+        columns["value"].append(float(value))
+
+    for case in results:
+        measurements = {k: v for k, v in case.items()
+                        if k != "latency_ms" and isinstance(v, (int, float)) and not isinstance(v, bool)}
+        measurements.update(case.get("scores", {}))
+        for metric, value in measurements.items():
+            add(case, metric, value)
+        latency = case.get("latency_ms")
+        if isinstance(latency, dict):
+            for stage, ms in latency.items():
+                add(case, f"latency_ms.{stage}", ms)
+        elif latency is not None:
+            add(case, "latency_ms.total", latency)
+
+    rows = len(columns["value"])
+    columns["run_id"] = [run_id] * rows
+    columns["timestamp"] = [now] * rows
+    columns["mode"] = [mode] * rows
+    columns["config_hash"] = [digest] * rows
+    table = pa.table(columns, schema=SCHEMA).append_column("date", pa.array([now.strftime("%Y-%m-%d")] * rows))
+
+    ds.write_dataset(
+        table,
+        directory,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=f"{run_id}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    return run_id
+
+
+def load_history(directory: str = HISTORY_DIR, since: Optional[str] = None, mode: Optional[str] = None,
+                 metrics: Optional[list] = None, columns: Optional[list] = None) -> pa.Table:
+    """
+    Read the history, pruning date partitions before `since` (YYYY-MM-DD) and
+    filtering rows by mode and metric names (or metric prefixes ending in ".").
+    """
+    dataset = ds.dataset(directory, format="parquet", partitioning=PARTITIONING)
+    condition = None
+
+    def both(a, b):
+        return b if a is None else a & b
+
+    if since is not None:
+        condition = both(condition, ds.field("date") >= since)
+    if mode is not None:
+        condition = both(condition, ds.field("mode") == mode)
+    table = dataset.to_table(columns=columns, filter=condition)
+
+    if metrics:
+        import pyarrow.compute as pc
+
+        names = table.column("metric")
+        keep = None
+        for metric in metrics:
+            match = pc.starts_with(names, metric) if metric.endswith(".") else pc.equal(names, metric)
+            keep = match if keep is None else pc.or_(keep, match)
+        table = table.filter(keep)
+    return table
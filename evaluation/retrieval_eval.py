@@ -0,0 +1,215 @@
+"""
+Retrieval-only evaluation: no answers are generated.
+
+Each labeled test case runs the retrieval half of HybridSearcher.search
+(create_filter -> search_metadata per collection, then search_docs and the
+optional reranker in qna mode). The ranked doc_ids are scored against the
+case's `relevant_doc_ids` with recall@k, MRR and nDCG@k, and every stage is
+timed so retrieval changes can be judged on speed and quality together.
+
+Label a test case by adding the doc_ids that answer it:
+
+    {"question": "...", "collections": ["policies"], "mode": "search",
+     "relevant_doc_ids": ["<doc_id>", ...]}
+
+Cases without `relevant_doc_ids` are skipped. `mode` defaults to "search".
+
+    python -m evaluation.retrieval_eval
+    python -m evaluation.retrieval_eval -k 5 10 20 --no-filter
+"""
+import argparse
+import json
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+
+from test import HybridSearcher, reranker
+from llm_scheduler import Priority, llm_priority
+from evaluation.history import HISTORY_DIR, append_run, current_config
+
+DATASET = "evaluation/test_dataset.json"
+REPORT = "evaluation/latest_retrieval_report.json"
+CANDIDATES = 50  # chunks fetched from docs in qna mode, as in search()
+METADATA_COLLECTIONS = ("best_practices", "policies")
+
+
+# -----------------------
+# Metrics (one row per test case)
+# -----------------------
+
+def relevance_matrix(rankings: List[List[str]], relevant: List[set], depth: int) -> np.ndarray:
+    """rel[i, j] = 1 if the j-th result of case i is relevant (padded with 0 past the ranking)"""
+    rel = np.zeros((len(rankings), depth), dtype=np.float64)
+    for i, (ranking, wanted) in enumerate(zip(rankings, relevant)):
+        hits = [doc_id in wanted for doc_id in ranking[:depth]]
+        rel[i, :len(hits)] = hits
+    return rel
+
+
+def recall_at_k(rel: np.ndarray, n_relevant: np.ndarray, k: int) -> np.ndarray:
+    return rel[:, :k].sum(axis=1) / n_relevant
+
+
+def reciprocal_rank(rel: np.ndarray) -> np.ndarray:
+    first = rel.argmax(axis=1)
+    return np.where(rel.any(axis=1), 1.0 / (first + 1), 0.0)
+
+
+def ndcg_at_k(rel: np.ndarray, n_relevant: np.ndarray, k: int) -> np.ndarray:
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    dcg = (rel[:, :k] * discounts).sum(axis=1)
+    # Ideal ranking puts every relevant doc first
+    ideal = np.concatenate([[0.0], np.cumsum(discounts)])[np.minimum(n_relevant, k).astype(int)]
+    return dcg / ideal
+
+
+def latency_percentiles(timings: Dict[str, List[float]]) -> Dict[str, dict]:
+    summary = {}
+    for stage, values in timings.items():
+        ms = np.asarray(values) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        summary[stage] = {"count": len(ms), "mean_ms": float(ms.mean()), "p50_ms": float(p50),
+                          "p95_ms": float(p95), "p99_ms": float(p99)}
+    return summary
+
+
+# -----------------------
+# Retrieval
+# -----------------------
+
+class RetrievalEvaluator:
+    def __init__(self, use_filter: bool = True):
+        self.searcher = HybridSearcher()
+        self.use_filter = use_filter
+
+    def _timed(self, timings: dict, stage: str, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+        return result
+
+    def retrieve(self, question: str, collections: List[str], mode: str, n: int):
+        """Ranked doc_ids and per-stage seconds, following search() without the LLM answer"""
+        timings = {}
+        doc_ids = []
+        vector_string = None
+        for collection_name in collections:
+            if collection_name not in METADATA_COLLECTIONS:
+                continue  # `data` rows have no doc_ids; unknown collections don't exist
+            if self.use_filter:
+                prompt = self.searcher.bp_prompt if collection_name == "best_practices" else self.searcher.pol_prompt
+                output = self._timed(timings, "filter", self.searcher.create_filter, question, prompt)
+            else:
+                output = {"vector_string": question, "filter": None}
+            if vector_string is None:
+                vector_string = output["vector_string"]  # search() uses the first collection's
+            docs = self._timed(timings, "search_metadata", self.searcher.search_metadata,
+                               output["vector_string"], collection_name, output["filter"], n)
+            doc_ids += [doc["doc_id"] for doc in docs]
+
+        if mode == "qna" and doc_ids:
+            chunks = self._timed(timings, "search_docs", self.searcher.search_docs, vector_string, doc_ids, CANDIDATES)
+            if reranker.enabled:
+                chunks = self._timed(timings, "rerank", reranker.rerank, question, chunks)
+            doc_ids = [chunk.get("doc_id") for chunk in chunks]
+
+        # First occurrence counts; chunks and repeated metadata hits collapse to one doc
+        ranking = list(dict.fromkeys(d for d in doc_ids if d))
+        timings["total"] = sum(timings.values())
+        return ranking, timings
+
+    def run(self, test_cases: List[dict], ks: List[int]) -> dict:
+        labeled = [case for case in test_cases if case.get("relevant_doc_ids")]
+        print(f"🔎 {len(labeled)} labeled cases ({len(test_cases) - len(labeled)} without relevant_doc_ids skipped)")
+        if not labeled:
+            return {}
+
+        depth = max(ks)
+        rankings, stage_timings, details = [], defaultdict(list), []
+        with llm_priority(Priority.BACKGROUND):
+            for i, case in enumerate(labeled):
+                ranking, timings = self.retrieve(
+                    case["question"],
+                    case.get("collections", list(METADATA_COLLECTIONS)),
+                    case.get("mode", "search"),
+                    case.get("n", depth),
+                )
+                rankings.append(ranking)
+                for stage, seconds in timings.items():
+                    stage_timings[stage].append(seconds)
+                details.append({
+                    "question": case["question"],
+                    "type": case.get("type"),
+                    "difficulty": case.get("difficulty"),
+                    "retrieved_doc_ids": ranking[:depth],
+                    "latency_ms": {stage: seconds * 1000 for stage, seconds in timings.items()},
+                })
+                print(f"   {i + 1}/{len(labeled)} {len(ranking)} docs in {timings['total'] * 1000:.0f} ms")
+
+        relevant = [set(case["relevant_doc_ids"]) for case in labeled]
+        n_relevant = np.array([len(r) for r in relevant], dtype=np.float64)
+        rel = relevance_matrix(rankings, relevant, depth)
+
+        scores = {"mrr": reciprocal_rank(rel)}
+        for k in ks:
+            scores[f"recall@{k}"] = recall_at_k(rel, n_relevant, k)
+            scores[f"ndcg@{k}"] = ndcg_at_k(rel, n_relevant, k)
+        for row, detail in enumerate(details):
+            detail["scores"] = {name: float(values[row]) for name, values in scores.items()}
+
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "mode": "retrieval",
+            "filter": self.use_filter,
+            "reranker": reranker.enabled,
+            "total_tests": len(labeled),
+            "skipped_unlabeled": len(test_cases) - len(labeled),
+            "metrics": {name: float(values.mean()) for name, values in scores.items()},
+            "latency": latency_percentiles(stage_timings),
+            "detailed_results": details,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval-only evaluation (recall@k, MRR, nDCG, stage latency)")
+    parser.add_argument("-k", type=int, nargs="+", default=[5, 10], help="Cutoffs for recall@k and nDCG@k")
+    parser.add_argument("--dataset", default=DATASET)
+    parser.add_argument("--output", default=REPORT)
+    parser.add_argument("--no-filter", action="store_true", help="Skip create_filter (no LLM calls at all)")
+    parser.add_argument("--min-recall", type=float, default=None, help="Exit 1 if recall@k (largest k) is below this")
+    args = parser.parse_args()
+
+    evaluator = RetrievalEvaluator(use_filter=not args.no_filter)
+    with open(args.dataset) as f:
+        dataset = json.load(f)
+    report = evaluator.run(dataset["test_cases"], sorted(args.k))
+    if not report:
+        print("No labeled test cases. Add relevant_doc_ids to cases in the dataset first.")
+        return
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n📊 Retrieval Evaluation ({report['total_tests']} cases)")
+    for name, value in report["metrics"].items():
+        print(f"   {name:<12}{value:.3f}")
+    print(f"\n   {'stage':<16}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}")
+    for stage, stats in report["latency"].items():
+        print(f"   {stage:<16}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+    print(f"   Results saved to: {args.output}")
+    run_id = append_run(report["detailed_results"], mode="retrieval",
+                        config={**current_config(), "filter": report["filter"], "k": sorted(args.k)})
+    print(f"   Run {run_id} appended to: {HISTORY_DIR}")
+
+    recall = report["metrics"][f"recall@{max(args.k)}"]
+    if args.min_recall is not None and recall < args.min_recall:
+        print(f"❌ recall@{max(args.k)} {recall:.3f} below {args.min_recall}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
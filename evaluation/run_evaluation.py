@@ -1,7 +1,9 @@
 import asyncio
 import json
-from eval_framework import RAGEvaluator
-from metrics import RAGMetrics
+from datetime import datetime
+from evaluation.eval_framework import RAGEvaluator
+from evaluation.metrics import RAGMetrics
+from evaluation.history import HISTORY_DIR, answer_config, append_run
 import sys
 
 async def main():
@@ -11,6 +13,7 @@ async def main():
     dataset = evaluator.load_test_dataset()
     
     results = []
+    case_collections = []
     total_similarity = 0
     
     print("🚀 Starting RAG Evaluation...")
@@ -18,10 +21,12 @@ async def main():
     for i, test_case in enumerate(dataset["test_cases"]):
         print(f"📝 Evaluating question {i+1}/{len(dataset['test_cases'])}")
         
+        collections = test_case.get("collections", ["best_practices", "policies", "data"])
+        case_collections.append(collections)
         result = await evaluator.evaluate_single_query(
             test_case["question"],
             test_case["expected_answer"],
-            test_case.get("collections", ["best_practices", "policies", "data"])
+            collections
         )
         
         similarity = metrics.semantic_similarity(
@@ -30,6 +35,8 @@ async def main():
         )
         
         result["semantic_similarity"] = similarity
+        result["type"] = test_case.get("type")
+        result["difficulty"] = test_case.get("difficulty")
         total_similarity += similarity
         results.append(result)
         
@@ -50,6 +57,9 @@ async def main():
     print(f"\n📊 Evaluation Complete!")
     print(f"   Average Similarity: {avg_similarity:.3f}")
     print(f"   Results saved to: evaluation/latest_report.json")
+
+    run_id = append_run(results, mode="answer", config=answer_config(case_collections))
+    print(f"   Run {run_id} appended to: {HISTORY_DIR}")
     
     if avg_similarity < 0.7:  
         print("❌ Performance below threshold!")
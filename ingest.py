@@ -0,0 +1,373 @@
+"""
+Builds the Qdrant collections queried by HybridSearcher.
+
+    python ingest.py best_practices data/best_practices.csv
+    python ingest.py policies data/policies.jsonl
+    python ingest.py data data/statistics.csv
+    python ingest.py docs data/docs/            (directory of .txt/.pdf/.json files)
+
+Source rows are streamed (CSV, JSON, JSON Lines, plain text, PDF), document
+text in `docs` is split into overlapping chunks, and texts are embedded in
+batches with the same dense and sparse models the searcher queries with.
+Batches are upserted from a small thread pool while the next batch embeds.
+
+Ingestion is incremental: every point stores the record key and a hash of the
+record's content, so re-running over a large corpus only re-embeds records
+that are new or changed. Use --prune to also drop records missing from the
+source. Values are stored with the types declared in schema.py (e.g. `year`
+as an integer), not as the strings CSV files hold.
+
+Collections built before incremental ingestion have points without a record
+key. Those can't be matched to source rows, so the first run over such a
+collection needs --prune: every row is re-inserted and the old points are
+deleted.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from qdrant_client import models
+
+from answer_cache import AnswerCache
+from schema import CollectionSchema, ensure_payload_indexes
+from vector_profiles import profile_for
+from test import HybridSearcher, qdrant
+
+INGEST_BATCH_SIZE = int(os.environ.get("INGEST_BATCH_SIZE", "64"))
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "4"))
+CHUNK_WORDS = int(os.environ.get("INGEST_CHUNK_WORDS", "200"))
+CHUNK_OVERLAP = int(os.environ.get("INGEST_CHUNK_OVERLAP", "40"))
+
+# Bookkeeping fields stored on every point (excluded from search results)
+KEY_FIELD = "ingest_key"
+HASH_FIELD = "content_hash"
+INGEST_FIELDS = [KEY_FIELD, HASH_FIELD]
+
+# Row field that identifies a record, per collection
+RECORD_KEYS = {
+    "best_practices": "id",
+    "policies": "id",
+    "data": "id",
+    "docs": "doc_id",
+}
+
+# Fields embedded for metadata collections; `data` rows embed every value
+EMBED_FIELDS = {
+    "best_practices": ["name_of_best_practice", "brief_description", "topic", "sector"],
+    "policies": ["Content Name ", "description", "content_type", "sector"],
+}
+
+
+@dataclass
+class Record:
+    key: str
+    content_hash: str
+    texts: List[str]  # one per point; several for chunked documents
+    payloads: List[dict]
+
+
+def clean_row(row: dict) -> dict:
+    """Drop empty cells so payloads only hold real values"""
+    return {k: v for k, v in row.items() if k and v is not None and v != "" and v != "nan"}
+
+
+def content_hash(row: dict) -> str:
+    return hashlib.sha256(json.dumps(row, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def chunk_words(text: str, size: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split text into chunks of `size` words, each repeating `overlap` words of the previous one"""
+    words = text.split()
+    if not words:
+        return []
+    step = max(1, size - overlap)
+    return [" ".join(words[i:i + size]) for i in range(0, max(1, len(words) - overlap), step)]
+
+
+def read_pdf_text(path: Path) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise ImportError("Ingesting PDF files needs the 'pypdf' package (or pre-extracted .txt files)") from e
+    return "\n".join(page.extract_text() or "" for page in PdfReader(str(path)).pages)
+
+
+def read_rows(path: Path) -> Iterator[dict]:
+    """Stream rows from a file or every supported file in a directory"""
+    if path.is_dir():
+        for child in sorted(path.rglob("*")):
+            if child.is_file() and child.suffix.lower() in (".csv", ".json", ".jsonl", ".txt", ".pdf"):
+                yield from read_rows(child)
+        return
+
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    elif suffix == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif suffix == ".json":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        yield from (data if isinstance(data, list) else [data])
+    elif suffix == ".txt":
+        yield {"doc_id": path.stem, "text": path.read_text(encoding="utf-8")}
+    elif suffix == ".pdf":
+        yield {"doc_id": path.stem, "text": read_pdf_text(path)}
+    else:
+        raise ValueError(f"Unsupported source file: {path}")
+
+
+def to_record(collection_name: str, row: dict, key_field: str,
+              schema: Optional[CollectionSchema] = None) -> Optional[Record]:
+    row = clean_row(row)
+    if schema is not None:
+        row = schema.coerce(row)
+    digest = content_hash(row)
+    key = str(row.get(key_field) or row.get("doc_id") or digest)
+    base = {**row, KEY_FIELD: key, HASH_FIELD: digest}
+
+    if collection_name == "docs":
+        body = str(row.get("text", ""))
+        meta = {k: v for k, v in base.items() if k != "text"}
+        chunks = chunk_words(body)
+        payloads = [{**meta, "chunk": i, "text": chunk} for i, chunk in enumerate(chunks)]
+        return Record(key, digest, chunks, payloads) if chunks else None
+
+    fields = EMBED_FIELDS.get(collection_name)
+    if fields is None:
+        text = " ".join(f"{k}: {v}" for k, v in row.items())
+    else:
+        text = " ".join(str(row[f]) for f in fields if f in row)
+    return Record(key, digest, [text], [base]) if text.strip() else None
+
+
+def point_id(collection_name: str, key: str, index: int) -> str:
+    """Stable id so a re-ingested record overwrites its own points"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{collection_name}|{key}|{index}"))
+
+
+class Embedder:
+    """Batch embedding with the models HybridSearcher queries with"""
+
+    def __init__(self, batch_size: int = INGEST_BATCH_SIZE):
+        from fastembed import SparseTextEmbedding, TextEmbedding
+
+        options = dict(HybridSearcher.options)
+        self.batch_size = batch_size
+        self.dense = TextEmbedding(model_name=HybridSearcher.DENSE_MODEL, **options)
+        self.sparse = SparseTextEmbedding(model_name=HybridSearcher.SPARSE_MODEL, **options)
+
+    def embed(self, texts: List[str]):
+        dense = list(self.dense.embed(texts, batch_size=self.batch_size))
+        sparse = list(self.sparse.embed(texts, batch_size=self.batch_size))
+        return dense, sparse
+
+
+class Ingestor:
+    def __init__(self, collection_name: str, client=qdrant, embedder: Embedder = None,
+                 batch_size: int = INGEST_BATCH_SIZE, workers: int = INGEST_WORKERS,
+                 schema: Optional[CollectionSchema] = None):
+        self.collection_name = collection_name
+        self.client = client
+        self.schema = schema
+        self.legacy_ids = []  # points written before ingest keys existed
+        self.embedder = embedder or Embedder(batch_size)
+        self.batch_size = batch_size
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upsert")
+        self.max_pending = workers * 2
+        self.pending = []
+        self.stats = {"records": 0, "unchanged": 0, "added": 0, "updated": 0, "removed": 0, "points": 0}
+
+    def ensure_collection(self, dense_size: int):
+        if self.client.collection_exists(self.collection_name):
+            return
+        profile = profile_for(self.collection_name)
+        print(f"[INGEST] Creating collection {self.collection_name} ({profile.name} profile)")
+        self.client.create_collection(
+            collection_name=self.collection_name,
+            vectors_config={"dense": profile.vector_params(dense_size)},
+            sparse_vectors_config={"sparse": models.SparseVectorParams()},
+            hnsw_config=profile.hnsw_config(),
+            quantization_config=profile.quantization_config(),
+        )
+        self.ensure_key_index()
+
+    def ensure_key_index(self):
+        """Keyword index on ingest_key, also for collections built before incremental ingestion"""
+        if not self.client.collection_exists(self.collection_name):
+            return
+        existing = self.client.get_collection(self.collection_name).payload_schema or {}
+        if KEY_FIELD not in existing:
+            print(f"[INGEST] Creating payload index {self.collection_name}.{KEY_FIELD}")
+            self.client.create_payload_index(self.collection_name, KEY_FIELD, models.PayloadSchemaType.KEYWORD)
+
+    def existing_hashes(self) -> Dict[str, str]:
+        """ingest_key -> content_hash for everything already in the collection; keyless points go to legacy_ids"""
+        if not self.client.collection_exists(self.collection_name):
+            return {}
+        hashes = {}
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=1000,
+                offset=offset,
+                with_payload=INGEST_FIELDS,
+                with_vectors=False,
+            )
+            for point in points:
+                key = point.payload.get(KEY_FIELD)
+                if key is not None:
+                    hashes[str(key)] = point.payload.get(HASH_FIELD)
+                else:
+                    self.legacy_ids.append(point.id)
+            if offset is None:
+                return hashes
+
+    def delete_keys(self, keys: List[str]):
+        for i in range(0, len(keys), 1000):
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=models.FilterSelector(filter=models.Filter(must=[
+                    models.FieldCondition(key=KEY_FIELD, match=models.MatchAny(any=keys[i:i + 1000]))
+                ])),
+            )
+
+    def delete_ids(self, ids: list):
+        for i in range(0, len(ids), 1000):
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=models.PointIdsList(points=ids[i:i + 1000]),
+            )
+
+    def _write(self, points: List[models.PointStruct], replaced: List[str]):
+        # Old chunks of changed documents go first; a shorter text would leave stale ones behind
+        if replaced:
+            self.delete_keys(replaced)
+        self.client.upsert(collection_name=self.collection_name, points=points, wait=True)
+
+    def _flush(self, batch: List[Record], replaced: List[str]):
+        texts = [text for record in batch for text in record.texts]
+        dense, sparse = self.embedder.embed(texts)
+        self.ensure_collection(len(dense[0]))
+
+        points = []
+        i = 0
+        for record in batch:
+            for index, payload in enumerate(record.payloads):
+                points.append(models.PointStruct(
+                    id=point_id(self.collection_name, record.key, index),
+                    vector={
+                        "dense": dense[i].tolist(),
+                        "sparse": models.SparseVector(indices=sparse[i].indices.tolist(), values=sparse[i].values.tolist()),
+                    },
+                    payload=payload,
+                ))
+                i += 1
+
+        # Embedding is the slow part; writes overlap with the next batch
+        while len(self.pending) >= self.max_pending:
+            self.pending.pop(0).result()
+        self.pending.append(self.pool.submit(self._write, points, replaced))
+        self.stats["points"] += len(points)
+
+    def run(self, rows: Iterator[dict], key_field: str, prune: bool = False) -> dict:
+        started = time.perf_counter()
+        self.ensure_key_index()
+        existing = self.existing_hashes()
+        if self.legacy_ids and not prune:
+            raise RuntimeError(
+                f"{self.collection_name} has {len(self.legacy_ids)} points without {KEY_FIELD} (built before "
+                f"incremental ingestion). Re-run with --prune to replace them, or they will be duplicated."
+            )
+        seen = set()
+        batch, replaced, size = [], [], 0
+
+        for row in rows:
+            record = to_record(self.collection_name, row, key_field, self.schema)
+            if record is None or record.key in seen:
+                continue
+            seen.add(record.key)
+            self.stats["records"] += 1
+
+            previous = existing.get(record.key)
+            if previous == record.content_hash:
+                self.stats["unchanged"] += 1
+                continue
+            if previous is None:
+                self.stats["added"] += 1
+            else:
+                self.stats["updated"] += 1
+                replaced.append(record.key)
+
+            # A record's chunks always land in the same batch
+            batch.append(record)
+            size += len(record.texts)
+            if size >= self.batch_size:
+                self._flush(batch, replaced)
+                batch, replaced, size = [], [], 0
+                print(f"[INGEST] {self.collection_name}: {self.stats['records']} records read, {self.stats['points']} points written")
+
+        if batch:
+            self._flush(batch, replaced)
+        for future in self.pending:
+            future.result()
+        self.pending = []
+        self.pool.shutdown()
+
+        if prune:
+            gone = [key for key in existing if key not in seen]
+            self.delete_keys(gone)
+            self.delete_ids(self.legacy_ids)
+            self.stats["removed"] = len(gone) + len(self.legacy_ids)
+
+        self.stats["duration_s"] = round(time.perf_counter() - started, 2)
+        return self.stats
+
+
+def ingest(collection_name: str, source: str, key_field: str = None, prune: bool = False,
+           batch_size: int = INGEST_BATCH_SIZE, workers: int = INGEST_WORKERS) -> dict:
+    """Incrementally ingest `source` into `collection_name` and return counters"""
+    key_field = key_field or RECORD_KEYS.get(collection_name, "doc_id")
+    ingestor = Ingestor(collection_name, batch_size=batch_size, workers=workers,
+                        schema=HybridSearcher.schemas.get(collection_name))
+    stats = ingestor.run(read_rows(Path(source)), key_field, prune=prune)
+    if collection_name in HybridSearcher.schemas:
+        ensure_payload_indexes(qdrant, {collection_name: HybridSearcher.schemas[collection_name]})
+
+    # Cached answers may quote records that just changed
+    if stats["added"] or stats["updated"] or stats["removed"]:
+        cache = AnswerCache(qdrant, HybridSearcher.DENSE_MODEL, HybridSearcher.options)
+        if cache.enabled:
+            cache.invalidate([collection_name])
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest source files into a Qdrant collection")
+    parser.add_argument("collection", choices=sorted(RECORD_KEYS))
+    parser.add_argument("source", help="CSV/JSON/JSONL/TXT/PDF file, or a directory of them")
+    parser.add_argument("--key-field", help="Row field identifying a record (default depends on the collection)")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="Texts embedded per batch")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="Parallel upsert threads")
+    parser.add_argument("--prune", action="store_true", help="Delete records that are no longer in the source, and points from before incremental ingestion")
+    args = parser.parse_args()
+
+    stats = ingest(args.collection, args.source, args.key_field, args.prune, args.batch_size, args.workers)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
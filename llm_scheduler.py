@@ -0,0 +1,371 @@
+"""
+Central scheduler for outbound Gemini calls.
+
+Every LLM call goes through `scheduler.call` (or `scheduler.stream` for
+streaming responses), which applies, in order:
+  - a circuit breaker per model that fails fast after repeated errors,
+  - admission control: at most LLM_MAX_CONCURRENCY calls in flight, with
+    waiters served by priority (interactive chat before evaluation),
+  - a token bucket per model limiting requests per minute,
+  - retries with exponential backoff and full jitter on 429/5xx and
+    connection errors.
+
+Priority is taken from the `llm_priority` context, so code paths such as the
+evaluator can mark everything they trigger as background work.
+"""
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from enum import IntEnum
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "16"))
+LLM_QUEUE_TIMEOUT = float(os.environ.get("LLM_QUEUE_TIMEOUT", "30"))
+LLM_RPM = float(os.environ.get("LLM_RPM", "600"))
+LLM_BURST = int(os.environ.get("LLM_BURST", "20"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", "20"))
+LLM_BREAKER_THRESHOLD = int(os.environ.get("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.environ.get("LLM_BREAKER_COOLDOWN", "30"))
+
+current_priority = contextvars.ContextVar("llm_priority", default=Priority.INTERACTIVE)
+
+
+@contextlib.contextmanager
+def llm_priority(priority: Priority):
+    """Run the enclosed code (and threads started via asyncio.to_thread) at this priority"""
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class SchedulerBusy(Exception):
+    """The call waited longer than LLM_QUEUE_TIMEOUT for an admission slot"""
+
+
+class CircuitOpen(Exception):
+    """The model has failed repeatedly and calls are being short-circuited"""
+
+
+def model_rpm(model: str) -> float:
+    """Per-model override, e.g. LLM_RPM_GEMINI_2_0_FLASH=1000"""
+    name = "LLM_RPM_" + "".join(c if c.isalnum() else "_" for c in model).upper()
+    return float(os.environ.get(name, LLM_RPM))
+
+
+# Transport failures raised by the HTTP stacks under the Gemini SDKs; none of
+# them subclass the builtin ConnectionError/TimeoutError
+TRANSIENT_ERRORS = [ConnectionError, TimeoutError]
+try:
+    import httpx
+    TRANSIENT_ERRORS.append(httpx.TransportError)
+except ImportError:
+    pass
+try:
+    import requests
+    TRANSIENT_ERRORS += [requests.ConnectionError, requests.Timeout]
+except ImportError:
+    pass
+try:
+    from google.api_core import exceptions as api_exceptions
+    TRANSIENT_ERRORS += [api_exceptions.ServiceUnavailable, api_exceptions.DeadlineExceeded,
+                         api_exceptions.RetryError]
+except ImportError:
+    pass
+TRANSIENT_ERRORS = tuple(TRANSIENT_ERRORS)
+
+
+def status_code(error: Exception):
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(error: Exception) -> bool:
+    code = status_code(error)
+    if code is not None:
+        return code == 429 or code >= 500
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+def is_client_error(error: Exception) -> bool:
+    """A 4xx other than 429: the request was bad but the model answered, so the breaker counts it as up"""
+    code = status_code(error)
+    return code is not None and 400 <= code < 500 and code != 429
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class Admission:
+    """Concurrency limit whose waiters are woken in priority order"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiters = []
+        self.seq = itertools.count()
+        self.lock = threading.Lock()
+
+    def acquire(self, priority: Priority, timeout: float):
+        with self.lock:
+            if self.active < self.limit and not self.waiters:
+                self.active += 1
+                return
+            entry = (int(priority), next(self.seq), threading.Event())
+            heapq.heappush(self.waiters, entry)
+
+        if entry[2].wait(timeout):
+            return
+        with self.lock:
+            # The slot may have been handed over just as we timed out
+            if entry[2].is_set():
+                return
+            self.waiters.remove(entry)
+            heapq.heapify(self.waiters)
+        raise SchedulerBusy(f"LLM queue wait exceeded {timeout:.0f}s")
+
+    def release(self):
+        with self.lock:
+            if self.waiters:
+                # Hand the slot straight to the highest-priority waiter
+                heapq.heappop(self.waiters)[2].set()
+            else:
+                self.active -= 1
+
+    def depth(self) -> dict:
+        with self.lock:
+            counts = defaultdict(int)
+            for priority, _, _ in self.waiters:
+                counts[Priority(priority).name.lower()] += 1
+            return {"in_flight": self.active, "queued": dict(counts)}
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def before_call(self, model: str):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown or self.trial_running:
+                raise CircuitOpen(f"{model} is temporarily unavailable after repeated errors")
+            # Half-open: let one trial call through
+            self.trial_running = True
+
+    def cancel_trial(self):
+        with self.lock:
+            self.trial_running = False
+
+    def record(self, success: bool):
+        with self.lock:
+            self.trial_running = False
+            if success:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, queue_timeout: float = LLM_QUEUE_TIMEOUT,
+                 max_retries: int = LLM_MAX_RETRIES):
+        self.admission = Admission(max_concurrency)
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.buckets = {}
+        self.breakers = {}
+        self.lock = threading.Lock()
+        self.counters = defaultdict(int)
+
+    def _bucket(self, model: str) -> TokenBucket:
+        with self.lock:
+            if model not in self.buckets:
+                self.buckets[model] = TokenBucket(model_rpm(model), LLM_BURST)
+            return self.buckets[model]
+
+    def _breaker(self, model: str) -> CircuitBreaker:
+        with self.lock:
+            if model not in self.breakers:
+                self.breakers[model] = CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN)
+            return self.breakers[model]
+
+    def _count(self, name: str):
+        with self.lock:
+            self.counters[name] += 1
+
+    def _backoff(self, attempt: int):
+        time.sleep(random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt)))
+
+    @contextlib.contextmanager
+    def _slot(self, model: str, priority: Priority):
+        """Hold an admission slot and a rate-limit token for one attempt"""
+        # Wait for the token before taking a slot, so slots are only held by
+        # calls that can run, never by calls sleeping on the rate limit
+        self._bucket(model).acquire()
+        try:
+            self.admission.acquire(priority, self.queue_timeout)
+        except SchedulerBusy:
+            self._count("rejected")
+            raise
+        try:
+            self._count("calls")
+            yield
+        finally:
+            self.admission.release()
+
+    def _should_retry(self, model: str, error: Exception, attempt: int) -> bool:
+        if attempt >= self.max_retries or not is_retryable(error):
+            self._count("failures")
+            return False
+        self._count("retries")
+        print(f"[LLM] {model} call failed ({str(error)}), retrying (attempt {attempt + 1})")
+        return True
+
+    def call(self, model: str, fn, *args, **kwargs):
+        """Run a blocking LLM call under admission control, rate limiting and retries"""
+        priority = current_priority.get()
+        breaker = self._breaker(model)
+        for attempt in range(self.max_retries + 1):
+            breaker.before_call(model)
+            try:
+                with self._slot(model, priority):
+                    result = fn(*args, **kwargs)
+            except SchedulerBusy:
+                breaker.cancel_trial()
+                raise
+            except Exception as e:
+                breaker.record(is_client_error(e))
+                if not self._should_retry(model, e, attempt):
+                    raise
+                # Backoff happens outside the slot so other calls can proceed
+                self._backoff(attempt)
+                continue
+            except BaseException:
+                breaker.cancel_trial()
+                raise
+            breaker.record(True)
+            return result
+
+    def stream(self, model: str, fn, *args, **kwargs):
+        """
+        Like call() for streaming responses. The admission slot is held until the
+        stream is consumed; failures are only retried before the first chunk.
+        """
+        priority = current_priority.get()
+        breaker = self._breaker(model)
+        for attempt in range(self.max_retries + 1):
+            breaker.before_call(model)
+            started = False
+            try:
+                with self._slot(model, priority):
+                    for chunk in fn(*args, **kwargs):
+                        started = True
+                        yield chunk
+            except SchedulerBusy:
+                breaker.cancel_trial()
+                raise
+            except Exception as e:
+                breaker.record(is_client_error(e))
+                if started or not self._should_retry(model, e, attempt):
+                    raise
+                self._backoff(attempt)
+                continue
+            except BaseException:
+                # Closed early (GeneratorExit on client disconnect): chunks
+                # arriving means the model is up, otherwise free the trial
+                if started:
+                    breaker.record(True)
+                else:
+                    breaker.cancel_trial()
+                raise
+            breaker.record(True)
+            return
+
+    async def stream_async(self, model: str, fn, *args, **kwargs):
+        """stream() consumed on a worker thread, so waiting for a slot never blocks the event loop"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        done = object()
+        stop = threading.Event()
+        context = contextvars.copy_context()  # carries llm_priority into the thread
+
+        def produce():
+            try:
+                for chunk in self.stream(model, fn, *args, **kwargs):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        loop.run_in_executor(None, context.run, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
+    def stats(self) -> dict:
+        with self.lock:
+            counters = dict(self.counters)
+            breakers = {model: breaker.state for model, breaker in self.breakers.items()}
+        return {**self.admission.depth(), **counters, "circuit_breakers": breakers}
+
+
+scheduler = LLMScheduler()
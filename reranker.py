@@ -0,0 +1,114 @@
+"""
+Optional cross-encoder reranking for qna context.
+
+In qna mode HybridSearcher fetches 50 fused chunks from `docs`. With
+RERANK=1 they are re-scored against the question by a small ONNX
+cross-encoder (fastembed's TextCrossEncoder, on CPU). Only the best
+RERANK_TOP_K chunks, optionally above RERANK_MIN_SCORE, go into the prompt.
+Scores are cached per (question, chunk), so repeated and shared questions
+only score chunks they haven't seen.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from singleflight import normalize_query
+
+RERANK_ENABLED = os.environ.get("RERANK", "0") == "1"
+RERANK_MODEL = os.environ.get("RERANK_MODEL", "Xenova/ms-marco-MiniLM-L-6-v2")
+RERANK_TOP_K = int(os.environ.get("RERANK_TOP_K", "10"))
+RERANK_MIN_SCORE = float(os.environ["RERANK_MIN_SCORE"]) if os.environ.get("RERANK_MIN_SCORE") else None
+RERANK_CACHE_SIZE = int(os.environ.get("RERANK_CACHE_SIZE", "20000"))
+RERANK_BATCH_SIZE = int(os.environ.get("RERANK_BATCH_SIZE", "16"))
+
+
+class Reranker:
+    def __init__(self, model_name: str = RERANK_MODEL, model_options: dict = None, top_k: int = RERANK_TOP_K,
+                 min_score: Optional[float] = RERANK_MIN_SCORE, cache_size: int = RERANK_CACHE_SIZE,
+                 enabled: bool = RERANK_ENABLED):
+        self.model_name = model_name
+        self.model_options = model_options or {}
+        self.top_k = top_k
+        self.min_score = min_score
+        self.cache_size = cache_size
+        self.enabled = enabled
+        self.model = None
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.calls = 0
+        self.seconds = 0.0
+
+    def _model(self):
+        if self.model is None:
+            with self.load_lock:
+                if self.model is None:
+                    from fastembed.rerank.cross_encoder import TextCrossEncoder
+                    self.model = TextCrossEncoder(model_name=self.model_name, **self.model_options)
+        return self.model
+
+    def _key(self, query: str, text: str):
+        return normalize_query(query), hashlib.sha1(text.encode("utf-8")).digest()
+
+    def scores(self, query: str, texts: List[str]) -> List[float]:
+        """Cross-encoder score of every text for the query, using the cache where possible"""
+        keys = [self._key(query, text) for text in texts]
+        scores = [None] * len(texts)
+        with self.lock:
+            for i, key in enumerate(keys):
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    scores[i] = self.cache[key]
+            missing = [i for i, score in enumerate(scores) if score is None]
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            fresh = list(self._model().rerank(query, [texts[i] for i in missing], batch_size=RERANK_BATCH_SIZE))
+            with self.lock:
+                for i, score in zip(missing, fresh):
+                    scores[i] = float(score)
+                    self.cache[keys[i]] = float(score)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return scores
+
+    def rerank(self, query: str, docs: List[dict], text_key: str = "text",
+               top_k: Optional[int] = None, min_score: Optional[float] = None) -> List[dict]:
+        """Best docs for the query, highest score first. `docs` is left untouched."""
+        if not docs:
+            return docs
+        top_k = self.top_k if top_k is None else top_k
+        min_score = self.min_score if min_score is None else min_score
+
+        started = time.perf_counter()
+        scores = self.scores(query, [str(doc.get(text_key, "")) for doc in docs])
+        ranked = sorted(zip(scores, range(len(docs))), key=lambda pair: pair[0], reverse=True)
+        kept = [docs[i] for score, i in ranked if min_score is None or score >= min_score][:top_k]
+        elapsed = time.perf_counter() - started
+
+        with self.lock:
+            self.calls += 1
+            self.seconds += elapsed
+        print(f"[DEBUG] Reranked {len(docs)} chunks to {len(kept)} in {elapsed * 1000:.0f}ms")
+        return kept
+
+    def stats(self) -> dict:
+        with self.lock:
+            hits, misses, calls, seconds, entries = self.hits, self.misses, self.calls, self.seconds, len(self.cache)
+        total = hits + misses
+        return {
+            "enabled": self.enabled,
+            "model": self.model_name,
+            "top_k": self.top_k,
+            "min_score": self.min_score,
+            "calls": calls,
+            "avg_ms": seconds / calls * 1000 if calls else 0.0,
+            "score_cache_hit_rate": hits / total if total else 0.0,
+            "score_cache_entries": entries,
+        }
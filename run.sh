@@ -13,8 +13,13 @@ if [ "$1" = "--with-eval" ]; then
     python -m evaluation.run_evaluation
 fi
 
-# Start services
-uvicorn server:app --reload &
+# Start services (WORKERS=N runs N uvicorn workers; session state is shared
+# through SESSION_STORE_URL, so any worker can serve any chat)
+if [ "${WORKERS:-1}" -gt 1 ]; then
+    uvicorn server:app --workers "$WORKERS" &
+else
+    uvicorn server:app --reload &
+fi
 cd app 
 npm run dev &
 
@@ -0,0 +1,295 @@
+"""
+Filterable payload fields per collection.
+
+The fields the LLM may filter on are declared in HybridSearcher's field
+prompts (`- name - TYPE ['value' ...]`). This module turns those prompts into
+a schema that is used to:
+  - create the matching payload indexes so filters don't scan the collection,
+  - clean up generated filters before they reach Qdrant: unknown keys are
+    dropped, key casing and enum values are normalized, text/value matches
+    are switched to what the field's index supports, and year ranges on
+    datetime fields become datetime ranges,
+  - convert source values at ingest time (see ingest.py): integers from CSV
+    strings, and bare years or MM-YYYY months on datetime fields to RFC 3339,
+    which is what the datetime index and the rewritten ranges compare against.
+"""
+import calendar
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from qdrant_client import models
+
+KEYWORD = "keyword"
+INTEGER = "integer"
+DATETIME = "datetime"
+TEXT = "text"
+
+# Prompt type -> index type. TEXT fields with a listed set of values are
+# categorical and get a keyword index; free TEXT gets a full-text index.
+PROMPT_TYPES = {
+    "KEYWORD": KEYWORD,
+    "UUID": KEYWORD,
+    "INTEGER": INTEGER,
+    "DATETIME": DATETIME,
+    "TEXT": TEXT,
+}
+
+CLAUSES = ("must", "should", "must_not")
+FIELD_LINE = re.compile(r"^-\s*(\S+)\s+-\s+([A-Z]+)\b(.*)$")
+MONTH_YEAR = re.compile(r"^(\d{1,2})[-/](\d{4})$")
+
+
+def normalize_key(key: str) -> str:
+    return re.sub(r"[\s\-]+", "_", str(key).strip().lower())
+
+
+def year_bound(value, upper: bool) -> Optional[str]:
+    """Inclusive RFC 3339 bound for a bare year (2009, "2009") or month ("03-2009"); None if not one"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and 1000 <= value <= 9999:
+        month, year = None, int(value)
+    elif isinstance(value, str) and re.fullmatch(r"\d{4}", value.strip()):
+        month, year = None, int(value)
+    elif isinstance(value, str) and MONTH_YEAR.match(value.strip()):
+        m = MONTH_YEAR.match(value.strip())
+        month, year = int(m.group(1)), int(m.group(2))
+    else:
+        return None
+    if not upper:
+        return f"{year:04d}-{month or 1:02d}-01T00:00:00Z"
+    month = month or 12
+    return f"{year:04d}-{month:02d}-{calendar.monthrange(year, month)[1]:02d}T23:59:59Z"
+
+
+@dataclass
+class FieldSpec:
+    name: str
+    index: str
+    values: List[str] = field(default_factory=list)
+
+    def canonical(self, value):
+        """Listed value matching `value` case-insensitively, else `value` unchanged"""
+        if not self.values or not isinstance(value, str):
+            return value
+        wanted = value.strip().lower()
+        for known in self.values:
+            if known.lower() == wanted:
+                return known
+        return value
+
+    def coerce(self, value):
+        """Source value (CSV cells are all strings) converted to the declared type"""
+        if self.index == DATETIME:
+            bound = year_bound(value, upper=False)
+            return value if bound is None else bound
+        if self.index != INTEGER or isinstance(value, bool):
+            return value
+        if isinstance(value, str):
+            try:
+                number = float(value.strip())
+            except ValueError:
+                return value
+        elif isinstance(value, float):
+            number = value
+        else:
+            return value
+        return int(number) if number.is_integer() else value
+
+    def index_params(self):
+        if self.index == TEXT:
+            return models.TextIndexParams(
+                type=models.TextIndexType.TEXT,
+                tokenizer=models.TokenizerType.WORD,
+                lowercase=True,
+                min_token_len=2,
+            )
+        return {
+            KEYWORD: models.PayloadSchemaType.KEYWORD,
+            INTEGER: models.PayloadSchemaType.INTEGER,
+            DATETIME: models.PayloadSchemaType.DATETIME,
+        }[self.index]
+
+
+class CollectionSchema:
+    def __init__(self, name: str, fields: List[FieldSpec]):
+        self.name = name
+        self.fields = {f.name: f for f in fields}
+        self.lookup = {normalize_key(f.name): f for f in fields}
+
+    @classmethod
+    def from_prompt(cls, name: str, prompt: str, columns: Optional[List[str]] = None) -> "CollectionSchema":
+        """
+        Parse `- field - TYPE ['a' 'b' ...]` lines; value lists may wrap onto
+        following lines. With `columns`, a prompt field is mapped to the payload
+        column it normalizes to (content_name -> "Content Name ").
+        """
+        payload_keys = {normalize_key(column): column for column in columns or []}
+        entries = []
+        for line in prompt.strip().splitlines():
+            line = line.strip()
+            match = FIELD_LINE.match(line)
+            if match:
+                entries.append([match.group(1), match.group(2), match.group(3)])
+            elif entries and line:
+                entries[-1][2] += " " + line
+
+        fields = []
+        for key, kind, rest in entries:
+            if kind not in PROMPT_TYPES:
+                continue
+            values = re.findall(r"'([^']*)'", rest)
+            index = PROMPT_TYPES[kind]
+            if index == TEXT and values:
+                index = KEYWORD
+            key = payload_keys.get(normalize_key(key), key)
+            fields.append(FieldSpec(key, index, values))
+        return cls(name, fields)
+
+    def resolve(self, key) -> Optional[FieldSpec]:
+        return self.lookup.get(normalize_key(key))
+
+    def coerce(self, row: dict) -> dict:
+        """Row with declared fields converted to their types, so range filters match at query time"""
+        return {k: self.fields[k].coerce(v) if k in self.fields else v for k, v in row.items()}
+
+    def ensure_indexes(self, client):
+        """Create payload indexes for declared fields that don't have one of the declared type yet"""
+        if not client.collection_exists(self.name):
+            return
+        existing = client.get_collection(self.name).payload_schema or {}
+        for spec in self.fields.values():
+            current = existing.get(spec.name)
+            if current is not None:
+                # The index type constants match Qdrant's payload schema type names
+                if getattr(current.data_type, "value", current.data_type) == spec.index:
+                    continue
+                print(f"[DEBUG] Replacing {current.data_type} payload index {self.name}.{spec.name}")
+                client.delete_payload_index(self.name, spec.name)
+            print(f"[DEBUG] Creating {spec.index} payload index {self.name}.{spec.name}")
+            client.create_payload_index(self.name, spec.name, field_schema=spec.index_params())
+
+    def sanitize(self, filter: Optional[dict]) -> Optional[models.Filter]:
+        """Generated filter dict -> Filter restricted to declared fields, or None"""
+        if not filter:
+            return None
+        cleaned = self._clean_filter(filter)
+        if not cleaned:
+            return None
+        try:
+            return models.Filter(**cleaned)
+        except Exception as e:
+            print(f"[ERROR] Dropping invalid filter for {self.name}: {str(e)}")
+            return None
+
+    def _clean_filter(self, filter: dict) -> dict:
+        cleaned = {}
+        for clause in CLAUSES:
+            conditions = filter.get(clause)
+            if conditions is None:
+                continue
+            if isinstance(conditions, dict):
+                conditions = [conditions]
+            kept = []
+            for condition in conditions:
+                if not isinstance(condition, dict):
+                    continue
+                if any(c in condition for c in CLAUSES):
+                    nested = self._clean_filter(condition)
+                    if nested:
+                        kept.append(nested)
+                else:
+                    condition = self._clean_condition(condition)
+                    if condition is not None:
+                        kept.append(condition)
+            if kept:
+                cleaned[clause] = kept
+        if cleaned.get("should") and isinstance(filter.get("min_should"), dict):
+            cleaned["min_should"] = filter["min_should"]
+        return cleaned
+
+    def _clean_condition(self, condition: dict) -> Optional[dict]:
+        if "has_id" in condition:
+            return condition
+        for wrapper in ("is_empty", "is_null"):
+            if wrapper in condition:
+                spec = self.resolve((condition[wrapper] or {}).get("key", ""))
+                return {wrapper: {"key": spec.name}} if spec else self._reject(condition)
+
+        spec = self.resolve(condition.get("key", ""))
+        if spec is None:
+            return self._reject(condition)
+        cleaned = {"key": spec.name}
+
+        match = condition.get("match")
+        if isinstance(match, dict):
+            match = self._clean_match(spec, match)
+            if isinstance(match, dict) and "range" in match:
+                cleaned["range"] = match["range"]
+            elif match is not None:
+                cleaned["match"] = match
+
+        for name in ("range", "values_count", "geo_radius", "geo_bounding_box"):
+            if name in condition:
+                cleaned[name] = condition[name]
+        if spec.index == DATETIME and isinstance(cleaned.get("range"), dict):
+            cleaned["range"] = self._datetime_range(cleaned["range"])
+        elif spec.index == INTEGER and isinstance(cleaned.get("range"), dict):
+            cleaned["range"] = {k: int(v) if isinstance(v, str) and v.strip().isdigit() else v
+                                for k, v in cleaned["range"].items()}
+
+        if len(cleaned) == 1:
+            return self._reject(condition)
+        return cleaned
+
+    def _clean_match(self, spec: FieldSpec, match: dict):
+        if "any" in match or "except" in match:
+            return {k: [spec.canonical(v) for v in values] if isinstance(values, list) else values
+                    for k, values in match.items()}
+        value = match.get("value", match.get("text"))
+        if value is None:
+            return match
+        if spec.index == KEYWORD:
+            canonical = spec.canonical(value)
+            # Listed values are exact keyword matches; MatchText would scan
+            if "value" in match or canonical in spec.values:
+                return {"value": canonical}
+            return match
+        if spec.index == TEXT:
+            return {"text": str(value)}
+        if spec.index == DATETIME:
+            lower, upper = year_bound(value, upper=False), year_bound(value, upper=True)
+            if lower is None:
+                return None
+            # An exact year on a datetime field means "anywhere in that year"
+            return {"range": {"gte": lower, "lte": upper}}
+        if spec.index == INTEGER:
+            number = spec.coerce(value)
+            if isinstance(number, int) and not isinstance(number, bool):
+                return {"value": number}
+            return None
+        return match
+
+    def _datetime_range(self, bounds: dict) -> dict:
+        converted = {}
+        for op, value in bounds.items():
+            # "lte 2009" ends with 2009, "gt 2009" starts after it
+            bound = year_bound(value, upper=op in ("lte", "gt"))
+            converted[op] = bound if bound is not None else value
+        return converted
+
+    def _reject(self, condition: dict):
+        print(f"[DEBUG] Dropping unsupported filter condition for {self.name}: {condition}")
+        return None
+
+
+# search_docs restricts the docs collection to doc_ids with MatchAny
+DOCS_SCHEMA = CollectionSchema("docs", [FieldSpec("doc_id", KEYWORD)])
+
+
+def ensure_payload_indexes(client, schemas: Dict[str, CollectionSchema]):
+    """Create missing payload indexes for every collection, skipping failures"""
+    for schema in schemas.values():
+        try:
+            schema.ensure_indexes(client)
+        except Exception as e:
+            print(f"[ERROR] Payload indexes for {schema.name} failed: {str(e)}")
@@ -2,17 +2,25 @@ from fastapi import FastAPI, UploadFile, File, Request, Response, Cookie
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse, FileResponse
 from pydantic import BaseModel
-from test import HybridSearcher
+from test import HybridSearcher, flights, qdrant, reranker
+from answer_cache import AnswerCache, entity_terms
+from embedding_models import DENSE_MODEL, MODEL_OPTIONS
+from warmup import WARMUP_ENABLED, WARMUP_EVAL_MODEL, WarmupState, rerank_step, retrieval_step, run_warmup
+from session_store import open_session_store
+from llm_scheduler import scheduler
+from schema import ensure_payload_indexes
+from speech import AudioTooLarge, Transcriber, TTSStore, TTS_DEFAULT_VOICE, limit_body, read_upload
 from typing import List, Optional
 import uuid
 import asyncio
+import hashlib
 import json
 import os
+from types import SimpleNamespace
 
-# Additional imports for evaluation
-from evaluation.eval_framework import RAGEvaluator
-from evaluation.metrics import RAGMetrics
-import numpy as np
+# Evaluation dependencies (SentenceTransformer, sklearn, pandas) are imported
+# lazily in get_evaluation_stack() so chat-only workers never load them
+import statistics
 from datetime import datetime
 from fastapi import Query as FastAPIQuery  # To avoid clash with your Query model
 
@@ -28,57 +36,47 @@ def load_chats():
             return json.load(f)
     return {}
 
-def save_chats(chats):
-    with open(CHATS_FILE, 'w') as f:
-        json.dump(chats, f, indent=2)
-
-# Store chat sessions and user sessions in memory
+# User -> chat ownership and message history live in the shared session store
+# so any uvicorn worker can serve any request. `sessions` only caches this
+# worker's LLM chat objects, rebuilt from stored history when missing or stale.
+store = open_session_store()
 sessions = {}
-user_sessions = {}
+session_message_counts = {}
 
 def get_or_create_session_id(session_id: Optional[str]) -> str:
     if session_id is None:
         return str(uuid.uuid4())
     return session_id
 
-def get_hybrid_searcher_for_session(session_id: str) -> HybridSearcher:
-    """Get or create a HybridSearcher instance for a chat session"""
-    if session_id not in sessions:
-        searcher = HybridSearcher()
-        # Create chat and store the searcher
-        chat_id = searcher.create_new_chat()
-        sessions[session_id] = searcher
-    else:
-        searcher = sessions[session_id]
-        # Switch to the correct chat or create new one if needed
-        if not searcher.switch_chat(session_id):
-            searcher.create_new_chat()
-    return sessions[session_id]
+def get_hybrid_searcher_for_session(session_id: str, history: list) -> HybridSearcher:
+    """Get this worker's HybridSearcher for a chat, rebuilding its context if another worker moved it on"""
+    if session_id in sessions and session_message_counts.get(session_id) == len(history):
+        return sessions[session_id]
+
+    searcher = sessions.get(session_id) or HybridSearcher()
+    searcher.drop_chats()
+    searcher.create_new_chat(history)
+    sessions[session_id] = searcher
+    session_message_counts[session_id] = len(history)
+    return searcher
 
 def get_or_create_user_session(user_session_id: Optional[str] = None) -> str:
     """Get existing user session ID or create a new one"""
-    if user_session_id is None or user_session_id not in user_sessions:
-        user_session_id = str(uuid.uuid4())
-        user_sessions[user_session_id] = []  # List to store chat IDs for this user
+    if user_session_id is None or not store.user_exists(user_session_id):
+        user_session_id = store.create_user()
     return user_session_id
 
-def get_chats_for_user(user_session_id: str) -> dict:
-    """Get all chats belonging to a user session in chronological order"""
-    chats = load_chats()
-    user_chat_ids = user_sessions.get(user_session_id, [])
-    # Return chats in the order they appear in user_chat_ids to maintain chronological order
-    return {chat_id: chats[chat_id] for chat_id in user_chat_ids if chat_id in chats}
+def get_chats_for_user(user_session_id: str) -> list:
+    """Get the IDs of all chats belonging to a user session in chronological order"""
+    return store.get_user_chats(user_session_id)
 
 def migrate_chats_to_user_sessions():
-    """One-time migration function to move existing chats to user sessions"""
+    """One-time migration of chats.json into the session store"""
     chats = load_chats()
     if not chats:
         return
-        
     # Create a default user session for existing chats
-    default_user_id = str(uuid.uuid4())
-    user_sessions[default_user_id] = list(chats.keys())
-    return default_user_id
+    return store.import_chats(chats)
 
 # Enable CORS
 app.add_middleware(
@@ -93,6 +91,7 @@ app.add_middleware(
 class Query(BaseModel):
     text: str
     collections: Optional[List[str]] = None
+    no_cache: bool = False  # Skip the semantic answer cache for this request
 
 class Message(BaseModel):
     role: str
@@ -102,32 +101,61 @@ class SaveChatRequest(BaseModel):
     session_id: str
     message: Message
 
-def cleanup_orphaned_chats():
-    """Clean up chats that don't belong to any user session"""
-    chats = load_chats()
-    if not chats:
-        return
-        
-    # Get all chat IDs from user sessions
-    active_chats = set()
-    for session_chats in user_sessions.values():
-        active_chats.update(session_chats)
-    
-    # Remove orphaned chats
-    orphaned_chats = set(chats.keys()) - active_chats
-    if orphaned_chats:
-        for chat_id in orphaned_chats:
-            del chats[chat_id]
-        save_chats(chats)
-        print(f"Cleaned up {len(orphaned_chats)} orphaned chats")
-
-# Call cleanup on startup
 @app.on_event("startup")
 async def startup_event():
-    default_user_id = migrate_chats_to_user_sessions()
+    default_user_id = await asyncio.to_thread(migrate_chats_to_user_sessions)
     if default_user_id:
         print(f"Migrated existing chats to default user session: {default_user_id}")
-    cleanup_orphaned_chats()
+    # Filters on unindexed payload fields scan the whole collection
+    app.state.index_task = asyncio.create_task(asyncio.to_thread(ensure_payload_indexes, qdrant, HybridSearcher.schemas))
+    if WARMUP_ENABLED:
+        app.state.warmup_task = asyncio.create_task(run_warmup(warmup_state, warmup_steps()))
+    else:
+        warmup_state.status = "ready"
+    if answer_cache.enabled:
+        app.state.answer_cache_task = asyncio.create_task(purge_answer_cache())
+
+# Replays answers to paraphrased first-turn questions (see answer_cache.py)
+answer_cache = AnswerCache(qdrant, DENSE_MODEL, MODEL_OPTIONS,
+                           entities=entity_terms(HybridSearcher.schemas))
+
+async def purge_answer_cache():
+    """Drop expired answer cache entries once an hour"""
+    while True:
+        try:
+            await asyncio.to_thread(answer_cache.purge_expired)
+        except Exception as e:
+            print(f"[ERROR] Answer cache purge failed: {str(e)}")
+        await asyncio.sleep(3600)
+
+async def replay_answer(chunks):
+    for text in chunks:
+        yield SimpleNamespace(text=text)
+
+warmup_state = WarmupState()
+
+def warmup_steps():
+    """Models to load before the worker reports ready"""
+    steps = [("retrieval_models", retrieval_step(HybridSearcher))]
+    if reranker.enabled:
+        steps.append(("rerank_model", rerank_step(reranker)))
+    if WARMUP_EVAL_MODEL:
+        async def evaluation_model():
+            _, metrics = await get_evaluation_stack()
+            await asyncio.to_thread(metrics.semantic_similarity, "warm up", "warm up")
+        steps.append(("evaluation_model", evaluation_model))
+    return steps
+
+@app.get("/api/health")
+async def health():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/api/ready")
+async def ready():
+    """Readiness: 200 only after model warm-up has finished"""
+    status_code = 200 if warmup_state.ready else 503
+    return JSONResponse(status_code=status_code, content=warmup_state.to_dict())
 
 @app.post("/api/chat")
 async def chat(
@@ -140,50 +168,74 @@ async def chat(
     if not session_id:
         return JSONResponse(status_code=400, content={"error": "No active chat session"})
         
-    # Get user session
-    if not user_session_id or user_session_id not in user_sessions:
+    # Get user session. Store calls run in threads: SQLite blocks on I/O and
+    # lock waits, which would stall every stream served by this worker
+    if not user_session_id or not await asyncio.to_thread(store.user_exists, user_session_id):
         return JSONResponse(status_code=403, content={"error": "Invalid user session"})
     
     # Verify this chat belongs to the user
-    if session_id not in user_sessions[user_session_id]:
+    if not await asyncio.to_thread(store.chat_belongs_to, user_session_id, session_id):
         return JSONResponse(status_code=403, content={"error": "Chat does not belong to user session"})
     
     # Set cookies
     response.set_cookie(key="session_id", value=session_id, httponly=True, samesite="lax")
     response.set_cookie(key="user_session_id", value=user_session_id, httponly=True, samesite="lax")
     
-    # Save user message
-    chats = load_chats()
-    if session_id not in chats:
-        chats[session_id] = []
-    chats[session_id].append({"role": "user", "content": query.text})
-    save_chats(chats)
-    
-    # Process query
-    hybrid_searcher = get_hybrid_searcher_for_session(session_id)
+    history = await asyncio.to_thread(store.get_messages, session_id)
     collections = query.collections or ["best_practices", "policies", "data"]
-    chat_response = hybrid_searcher.process_query(query.text, collections)
+
+    # First-turn questions don't depend on chat context, so a cached answer to
+    # a paraphrase of the same question can be replayed
+    use_answer_cache = not history and not query.no_cache and answer_cache.enabled
+    cached_chunks = None
+    if use_answer_cache:
+        try:
+            cached_chunks = await asyncio.to_thread(answer_cache.lookup, query.text, collections)
+        except Exception as e:
+            print(f"[ERROR] Answer cache lookup failed: {str(e)}")
+
+    # Save user message
+    await asyncio.to_thread(store.append_message, session_id, "user", query.text)
+
+    if cached_chunks is not None:
+        chat_response = replay_answer(cached_chunks)
+    else:
+        # Process query with context rebuilt from the stored history if needed
+        hybrid_searcher = get_hybrid_searcher_for_session(session_id, history)
+        chat_response = hybrid_searcher.process_query(query.text, collections)
     
     async def save_and_stream(response):
         accumulated_response = ""
+        chunks = []
+        failed = False
         async for chunk in response:
             if hasattr(chunk, 'text'):
                 text = chunk.text
                 accumulated_response += text
             elif isinstance(chunk, dict) and 'text' in chunk:
+                # process_query reports errors as plain dicts
                 text = chunk['text']
                 accumulated_response += text
+                failed = True
             else:
                 continue
+            chunks.append(text)
             
             yield f"data: {json.dumps(text)}\n\n"
-            await asyncio.sleep(0.5)
+            if cached_chunks is None:
+                await asyncio.sleep(0.5)
             
         # Save assistant response
-        chats = load_chats()
-        if session_id in chats:
-            chats[session_id].append({"role": "assistant", "content": accumulated_response})
-            save_chats(chats)
+        if await asyncio.to_thread(store.chat_belongs_to, user_session_id, session_id):
+            await asyncio.to_thread(store.append_message, session_id, "assistant", accumulated_response)
+            if cached_chunks is None:
+                session_message_counts[session_id] = len(history) + 2
+
+        if use_answer_cache and cached_chunks is None and not failed:
+            try:
+                await asyncio.to_thread(answer_cache.store, query.text, collections, chunks)
+            except Exception as e:
+                print(f"[ERROR] Answer cache store failed: {str(e)}")
     
     return StreamingResponse(
         save_and_stream(chat_response),
@@ -196,7 +248,7 @@ async def new_chat(
     user_session_id: Optional[str] = Cookie(default=None)
 ):
     # Get or create user session
-    user_session_id = get_or_create_user_session(user_session_id)
+    user_session_id = await asyncio.to_thread(get_or_create_user_session, user_session_id)
     
     # Create new chat session
     chat_id = str(uuid.uuid4())
@@ -205,20 +257,8 @@ async def new_chat(
     response.set_cookie(key="session_id", value=chat_id, httponly=True, samesite="lax")
     response.set_cookie(key="user_session_id", value=user_session_id, httponly=True, samesite="lax")
     
-    # Initialize new chat with HybridSearcher
-    hybrid_searcher = HybridSearcher()
-    hybrid_searcher.create_new_chat()  # Create initial chat session
-    sessions[chat_id] = hybrid_searcher
-    
-    # Initialize chat storage
-    chats = load_chats()
-    chats[chat_id] = []
-    save_chats(chats)
-    
-    # Add chat to user's session
-    if user_session_id not in user_sessions:
-        user_sessions[user_session_id] = []
-    user_sessions[user_session_id].append(chat_id)
+    # Add chat to user's session; the LLM chat is created on first message
+    await asyncio.to_thread(store.add_chat, user_session_id, chat_id)
     
     return {"status": "ok", "session_id": chat_id, "user_session_id": user_session_id}
 
@@ -228,28 +268,21 @@ async def delete_chat(
     user_session_id: Optional[str] = Cookie(default=None)
 ):
     # Verify user owns this chat
-    user_session_id = get_or_create_user_session(user_session_id)
-    if user_session_id not in user_sessions or chat_id not in user_sessions[user_session_id]:
+    user_session_id = await asyncio.to_thread(get_or_create_user_session, user_session_id)
+    if not await asyncio.to_thread(store.chat_belongs_to, user_session_id, chat_id):
         return JSONResponse(status_code=403, content={"error": "Unauthorized"})
     
-    # Remove chat from storage
-    chats = load_chats()
-    if chat_id in chats:
-        del chats[chat_id]
-        save_chats(chats)
-    
-    # Remove from user session while maintaining order of remaining chats
-    if chat_id in user_sessions[user_session_id]:
-        user_sessions[user_session_id].remove(chat_id)
+    # Remove chat and its messages from storage
+    await asyncio.to_thread(store.delete_chat, user_session_id, chat_id)
     
-    # Clean up HybridSearcher instance
-    if chat_id in sessions:
-        searcher = sessions[chat_id]
-        del sessions[chat_id]
+    # Clean up this worker's HybridSearcher instance
+    searcher = sessions.pop(chat_id, None)
+    if searcher is not None:
+        searcher.drop_chats()
+    session_message_counts.pop(chat_id, None)
     
     # Get updated chat list with new numbering
-    user_chats = get_chats_for_user(user_session_id)
-    chat_ids = list(user_chats.keys())
+    chat_ids = await asyncio.to_thread(get_chats_for_user, user_session_id)
     chat_list = [{"id": id, "name": f"Chat {idx + 1}"} for idx, id in enumerate(chat_ids)]
     chat_list.reverse()
     
@@ -260,54 +293,156 @@ async def delete_chat(
         }
     )
 
+def make_etag(*parts) -> str:
+    """Weak ETag over the values that determine a response body"""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+async def cached_json(request: Request, etag: str, build_content, headers: dict = None):
+    """304 if the client already has this version, otherwise build the body (in a thread) and send it"""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", **(headers or {})}
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=await asyncio.to_thread(build_content), headers=headers)
+
 @app.get("/api/chats")
 async def get_chats(
+    request: Request,
+    limit: Optional[int] = FastAPIQuery(default=None, ge=1, le=200),
+    before: Optional[str] = None,
     user_session_id: Optional[str] = Cookie(default=None)
 ):
-    user_session_id = get_or_create_user_session(user_session_id)
-    user_chats = get_chats_for_user(user_session_id)
+    user_session_id = await asyncio.to_thread(get_or_create_user_session, user_session_id)
     # Keep original order (oldest first) but reverse at the end for display
-    chat_ids = list(user_chats.keys())
-    chat_list = [{"id": id, "name": f"Chat {idx + 1}"} for idx, id in enumerate(chat_ids)]
-    chat_list.reverse()  # Most recent chat first, but numbers stay sequential from oldest to newest
-    
-    return JSONResponse(
-        content={"chats": chat_list},
+    chat_ids = await asyncio.to_thread(get_chats_for_user, user_session_id)
+    etag = make_etag(user_session_id, ",".join(chat_ids), limit, before)
+
+    def build():
+        chat_list = [{"id": id, "name": f"Chat {idx + 1}"} for idx, id in enumerate(chat_ids)]
+        chat_list.reverse()  # Most recent chat first, but numbers stay sequential from oldest to newest
+
+        # Cursor pagination: `before` is the id of the last chat on the previous page
+        start = 0
+        if before is not None:
+            start = next((i + 1 for i, c in enumerate(chat_list) if c["id"] == before), len(chat_list))
+        end = len(chat_list) if limit is None else start + limit
+        page = chat_list[start:end]
+        has_more = end < len(chat_list)
+        return {
+            "chats": page,
+            "has_more": has_more,
+            "next_before": page[-1]["id"] if has_more and page else None,
+        }
+
+    return await cached_json(
+        request, etag, build,
         headers={"Set-Cookie": f"user_session_id={user_session_id}; HttpOnly; SameSite=Lax"}
     )
 
 @app.get("/api/chat_history/{session_id}")
 async def get_chat_history(
     session_id: str,
+    request: Request,
+    limit: Optional[int] = FastAPIQuery(default=None, ge=1, le=500),
+    before: Optional[int] = None,
     user_session_id: Optional[str] = Cookie(default=None)
 ):
+    """
+    Chat messages, oldest first. With `limit`, returns the newest `limit`
+    messages older than message id `before`; follow `next_before` for older pages.
+    """
     # Verify user owns this chat
-    user_session_id = get_or_create_user_session(user_session_id)
-    if user_session_id not in user_sessions or session_id not in user_sessions[user_session_id]:
+    user_session_id = await asyncio.to_thread(get_or_create_user_session, user_session_id)
+    if not await asyncio.to_thread(store.chat_belongs_to, user_session_id, session_id):
         return JSONResponse(status_code=403, content={"error": "Unauthorized"})
-    
-    chats = load_chats()
-    return {"messages": chats.get(session_id, [])}
+
+    count, last_id = await asyncio.to_thread(store.chat_version, session_id)
+    etag = make_etag(session_id, count, last_id, limit, before)
+
+    def build():
+        if limit is None:
+            messages = store.get_messages(session_id, before=before)
+            has_more = False
+        else:
+            messages = store.get_messages(session_id, limit=limit + 1, before=before)
+            has_more = len(messages) > limit
+            messages = messages[-limit:]
+        return {
+            "messages": messages,
+            "has_more": has_more,
+            "next_before": messages[0]["id"] if has_more else None,
+            "last_id": last_id,
+        }
+
+    return await cached_json(request, etag, build)
+
+@app.get("/api/chat_history/{session_id}/delta")
+async def get_chat_history_delta(
+    session_id: str,
+    request: Request,
+    after: int = 0,
+    limit: Optional[int] = FastAPIQuery(default=None, ge=1, le=500),
+    user_session_id: Optional[str] = Cookie(default=None)
+):
+    """Only the messages with id greater than `after` (the client's last seen `last_id`)"""
+    user_session_id = await asyncio.to_thread(get_or_create_user_session, user_session_id)
+    if not await asyncio.to_thread(store.chat_belongs_to, user_session_id, session_id):
+        return JSONResponse(status_code=403, content={"error": "Unauthorized"})
+
+    count, last_id = await asyncio.to_thread(store.chat_version, session_id)
+    etag = make_etag(session_id, count, last_id, "delta", after, limit)
+
+    def build():
+        messages = store.get_messages_since(session_id, after, limit) if last_id > after else []
+        return {
+            "messages": messages,
+            "last_id": messages[-1]["id"] if messages else max(after, 0),
+            "has_more": bool(messages) and messages[-1]["id"] < last_id,
+        }
+
+    return await cached_json(request, etag, build)
 
 class TTSRequest(BaseModel):
     text: str
+    voice: Optional[str] = None
+
+# Content-addressed TTS cache, size-capped with LRU eviction
+tts_store = TTSStore(UPLOAD_DIR, HybridSearcher)
 
 @app.post("/api/tts")
 async def text_to_speech(request: TTSRequest):
     try:
-        # Generate unique filename
-        file_name = os.path.join(UPLOAD_DIR, f"tts_{uuid.uuid4()}.wav")
-        
-        # Get default HybridSearcher instance
-        searcher = HybridSearcher()
-        
-        # Generate audio file
-        output_file = searcher.tts(request.text, file_name)
-        
-        return FileResponse(
-            output_file,
+        voice = request.voice or TTS_DEFAULT_VOICE
+
+        # Serve previously synthesized audio from disk
+        cached_file = tts_store.lookup(request.text, voice)
+        if cached_file:
+            return FileResponse(
+                cached_file,
+                media_type="audio/wav",
+                filename="speech.wav"
+            )
+
+        # Otherwise stream PCM as it is generated; pull the first chunk here
+        # so synthesis errors still surface as a 500
+        audio_stream = tts_store.stream(request.text, voice)
+        first_chunk = await audio_stream.__anext__()
+
+        async def relay():
+            yield first_chunk
+            async for chunk in audio_stream:
+                yield chunk
+
+        return StreamingResponse(
+            relay(),
             media_type="audio/wav",
-            filename="speech.wav"
+            headers={"Content-Disposition": 'attachment; filename="speech.wav"'}
         )
     except Exception as e:
         return JSONResponse(
@@ -315,36 +450,52 @@ async def text_to_speech(request: TTSRequest):
             content={"error": f"TTS generation failed: {str(e)}"}
         )
 
+# Shared speech-to-text worker pool and transcript cache
+transcriber = Transcriber(HybridSearcher)
+
 @app.post("/api/audio")
-async def process_audio(file: UploadFile = File(...)):
+async def process_audio(request: Request):
+    form = None
     try:
-        # Validate file type
-        if not file.content_type.startswith('audio/'):
+        # The form is parsed here, not by FastAPI, so oversized uploads are
+        # refused from Content-Length or while the body is still streaming in
+        try:
+            form = await limit_body(request).form()
+            file = form.get("file")
+            if file is None or isinstance(file, str):
+                return JSONResponse(
+                    status_code=400,
+                    content={"error": "No audio file uploaded"}
+                )
+
+            # Validate file type
+            if not file.content_type or not file.content_type.startswith('audio/'):
+                return JSONResponse(
+                    status_code=400,
+                    content={"error": f"Invalid file type: {file.content_type}. Expected audio/*"}
+                )
+
+            # Hash the spooled file in chunks, then read it once
+            upload = await read_upload(file)
+        except AudioTooLarge as e:
             return JSONResponse(
-                status_code=400,
-                content={"error": f"Invalid file type: {file.content_type}. Expected audio/*"}
+                status_code=413,
+                content={"error": str(e)}
             )
-
-        # Read the audio file contents
-        try:
-            contents = await file.read()
         except Exception as e:
             return JSONResponse(
                 status_code=400,
                 content={"error": f"Failed to read audio file: {str(e)}"}
             )
             
-        if not contents:
+        if not upload.data:
             return JSONResponse(
                 status_code=400,
                 content={"error": "Empty audio file"}
             )
 
-        # Get default HybridSearcher instance for speech-to-text
-        searcher = HybridSearcher()
-        
-        # Convert speech to text
-        transcript = searcher.send_audio(contents)
+        # Convert speech to text off the event loop (cached by content hash)
+        transcript = await transcriber.transcribe(upload)
         
         if not transcript:
             return JSONResponse(
@@ -359,13 +510,29 @@ async def process_audio(file: UploadFile = File(...)):
             status_code=500,
             content={"error": f"Speech-to-text conversion failed: {str(e)}"}
         )
+    finally:
+        if form is not None:
+            await form.close()
 
 # -----------------------
 # === Evaluation Endpoints ===
 # -----------------------
 
-evaluator = RAGEvaluator()
-metrics_calculator = RAGMetrics()
+evaluator = None
+metrics_calculator = None
+evaluation_lock = asyncio.Lock()
+
+async def get_evaluation_stack():
+    """Load RAGEvaluator and RAGMetrics on first use, off the event loop"""
+    global evaluator, metrics_calculator
+    async with evaluation_lock:
+        if evaluator is None:
+            def load():
+                from evaluation.eval_framework import RAGEvaluator
+                from evaluation.metrics import RAGMetrics
+                return RAGEvaluator(), RAGMetrics()
+            evaluator, metrics_calculator = await asyncio.to_thread(load)
+    return evaluator, metrics_calculator
 
 
 @app.post("/api/evaluate")
@@ -376,6 +543,7 @@ async def run_evaluation(
     Run evaluation on your test dataset.
     Optionally override the collections to use.
     """
+    evaluator, metrics_calculator = await get_evaluation_stack()
     test_dataset = evaluator.load_test_dataset()
     results = []
     
@@ -387,15 +555,23 @@ async def run_evaluation(
         )
         
         # Calculate semantic similarity
-        similarity = metrics_calculator.semantic_similarity(
+        similarity = await asyncio.to_thread(
+            metrics_calculator.semantic_similarity,
             result["generated_answer"],
             result["expected_answer"]
         )
         
         result["semantic_similarity"] = similarity
+        result["type"] = test_case.get("type")
+        result["difficulty"] = test_case.get("difficulty")
         results.append(result)
     
-    average_similarity = np.mean([r["semantic_similarity"] for r in results]) if results else 0.0
+    average_similarity = statistics.fmean(r["semantic_similarity"] for r in results) if results else 0.0
+
+    if results:
+        # Same history as evaluation/run_evaluation.py, for the dashboard's trends
+        from evaluation.history import answer_config, append_run
+        await asyncio.to_thread(append_run, results, "answer", answer_config([collections]))
     
     return {
         "evaluation_results": results,
@@ -404,6 +580,28 @@ async def run_evaluation(
     }
 
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Cache and deduplication counters for this worker"""
+    return {
+        "singleflight": flights.stats(),
+        "llm": scheduler.stats(),
+        "reranker": reranker.stats(),
+        "answer_cache": answer_cache.stats(),
+        "transcription_cache": transcriber.stats(),
+        "tts_cache": tts_store.stats(),
+    }
+
+
+@app.delete("/api/answer_cache")
+async def clear_answer_cache(
+    collections: Optional[List[str]] = FastAPIQuery(default=None)
+):
+    """Invalidate cached answers, e.g. after re-indexing a collection"""
+    await asyncio.to_thread(answer_cache.invalidate, collections)
+    return {"status": "ok"}
+
+
 @app.get("/api/evaluation/status")
 async def get_evaluation_status():
     """
@@ -413,5 +611,6 @@ async def get_evaluation_status():
     return {
         "qdrant_status": "running",   # Ideally add code to check Docker/Qdrant health
         "collections_available": ["best_practices", "policies", "data"],
+        "evaluation_loaded": evaluator is not None,
         "last_evaluation": None  # You can update with a timestamp once you integrate persistent logging
     }
@@ -0,0 +1,324 @@
+"""
+Shared session state for the chat server.
+
+Holds user -> chat ownership and the message history of every chat, so any
+uvicorn worker can serve any request. SQLite is the default backend; a
+Redis-compatible store can be used by pointing SESSION_STORE_URL at it:
+
+    SESSION_STORE_URL=sqlite:///sessions.db      (default)
+    SESSION_STORE_URL=redis://localhost:6379/0
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+SESSION_STORE_URL = os.environ.get("SESSION_STORE_URL", "sqlite:///sessions.db")
+
+# Assigns the message id and appends in one step, so a chat's list stays
+# sorted by id even with concurrent appends (cursor pagination relies on it)
+APPEND_MESSAGE_LUA = """
+local id = redis.call('INCR', KEYS[2])
+redis.call('RPUSH', KEYS[1], cjson.encode({id = id, role = ARGV[1], content = ARGV[2]}))
+return id
+"""
+
+
+class SessionStore(ABC):
+    """Interface shared by the storage backends"""
+
+    @abstractmethod
+    def create_user(self) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def user_exists(self, user_id: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_chat(self, user_id: str, chat_id: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_user_chats(self, user_id: str) -> List[str]:
+        """Chat ids owned by the user, oldest first"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def chat_belongs_to(self, user_id: str, chat_id: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_chat(self, user_id: str, chat_id: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def append_message(self, chat_id: str, role: str, content: str) -> int:
+        """Store a message and return its sequence id (increasing per store)"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_messages(self, chat_id: str, limit: Optional[int] = None, before: Optional[int] = None) -> List[Dict]:
+        """Messages oldest first; with `limit`, only the newest `limit` with id < `before`"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_messages_since(self, chat_id: str, after: int, limit: Optional[int] = None) -> List[Dict]:
+        """Messages with id > `after`, oldest first"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def chat_version(self, chat_id: str) -> Tuple[int, int]:
+        """(message count, last message id); changes whenever the chat does"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def import_chats(self, chats: Dict[str, List[Dict]]) -> Optional[str]:
+        """
+        One-time import of legacy chats.json data under a new default user.
+        Returns the user id, or None if the store already holds chats.
+        """
+        raise NotImplementedError
+
+
+class SQLiteSessionStore(SessionStore):
+    def __init__(self, path: str = "sessions.db"):
+        self.path = path
+        self.local = threading.local()
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS users (
+                    id TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS chats (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT UNIQUE NOT NULL,
+                    user_id TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS chats_user ON chats(user_id, seq);
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS messages_chat ON messages(chat_id, id);
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets workers read while another writes"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self.local.conn = conn
+        return conn
+
+    def create_user(self) -> str:
+        user_id = str(uuid.uuid4())
+        self._connect().execute("INSERT INTO users (id, created_at) VALUES (?, ?)", (user_id, time.time()))
+        return user_id
+
+    def user_exists(self, user_id: str) -> bool:
+        row = self._connect().execute("SELECT 1 FROM users WHERE id = ?", (user_id,)).fetchone()
+        return row is not None
+
+    def add_chat(self, user_id: str, chat_id: str):
+        self._connect().execute(
+            "INSERT INTO chats (id, user_id, created_at) VALUES (?, ?, ?)", (chat_id, user_id, time.time())
+        )
+
+    def get_user_chats(self, user_id: str) -> List[str]:
+        rows = self._connect().execute("SELECT id FROM chats WHERE user_id = ? ORDER BY seq", (user_id,))
+        return [row["id"] for row in rows]
+
+    def chat_belongs_to(self, user_id: str, chat_id: str) -> bool:
+        row = self._connect().execute(
+            "SELECT 1 FROM chats WHERE id = ? AND user_id = ?", (chat_id, user_id)
+        ).fetchone()
+        return row is not None
+
+    def delete_chat(self, user_id: str, chat_id: str):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM chats WHERE id = ? AND user_id = ?", (chat_id, user_id))
+            conn.execute("DELETE FROM messages WHERE chat_id = ?", (chat_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def append_message(self, chat_id: str, role: str, content: str) -> int:
+        cursor = self._connect().execute(
+            "INSERT INTO messages (chat_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+            (chat_id, role, content, time.time()),
+        )
+        return cursor.lastrowid
+
+    def get_messages(self, chat_id: str, limit: Optional[int] = None, before: Optional[int] = None) -> List[Dict]:
+        sql = "SELECT id, role, content FROM messages WHERE chat_id = ?"
+        params = [chat_id]
+        if before is not None:
+            sql += " AND id < ?"
+            params.append(before)
+        if limit is None:
+            rows = self._connect().execute(sql + " ORDER BY id", params)
+            return [dict(row) for row in rows]
+        rows = self._connect().execute(sql + " ORDER BY id DESC LIMIT ?", params + [limit])
+        return [dict(row) for row in reversed(rows.fetchall())]
+
+    def get_messages_since(self, chat_id: str, after: int, limit: Optional[int] = None) -> List[Dict]:
+        rows = self._connect().execute(
+            "SELECT id, role, content FROM messages WHERE chat_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (chat_id, after, -1 if limit is None else limit),
+        )
+        return [dict(row) for row in rows]
+
+    def chat_version(self, chat_id: str) -> Tuple[int, int]:
+        row = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(MAX(id), 0) FROM messages WHERE chat_id = ?", (chat_id,)
+        ).fetchone()
+        return row[0], row[1]
+
+    def import_chats(self, chats: Dict[str, List[Dict]]) -> Optional[str]:
+        conn = self._connect()
+        # Every worker runs this on startup; the write lock makes it happen once
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM chats LIMIT 1").fetchone() is not None:
+                conn.execute("ROLLBACK")
+                return None
+            user_id = str(uuid.uuid4())
+            now = time.time()
+            conn.execute("INSERT INTO users (id, created_at) VALUES (?, ?)", (user_id, now))
+            for chat_id, messages in chats.items():
+                conn.execute("INSERT INTO chats (id, user_id, created_at) VALUES (?, ?, ?)", (chat_id, user_id, now))
+                conn.executemany(
+                    "INSERT INTO messages (chat_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                    [(chat_id, m["role"], m["content"], now) for m in messages],
+                )
+            conn.execute("COMMIT")
+            return user_id
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Works with any Redis-compatible server (Redis, Valkey, KeyDB, Dragonfly).
+
+    Keys:
+        users                   set of user ids
+        user:<id>:chats         list of chat ids, oldest first
+        chat:<id>:owner         owning user id
+        chat:<id>:messages      list of JSON messages
+        message_seq             counter for message ids
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("SESSION_STORE_URL points at Redis but the 'redis' package is not installed") from e
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.append_script = self.redis.register_script(APPEND_MESSAGE_LUA)
+
+    def create_user(self) -> str:
+        user_id = str(uuid.uuid4())
+        self.redis.sadd("users", user_id)
+        return user_id
+
+    def user_exists(self, user_id: str) -> bool:
+        return bool(self.redis.sismember("users", user_id))
+
+    def add_chat(self, user_id: str, chat_id: str):
+        pipe = self.redis.pipeline()
+        pipe.rpush(f"user:{user_id}:chats", chat_id)
+        pipe.set(f"chat:{chat_id}:owner", user_id)
+        pipe.execute()
+
+    def get_user_chats(self, user_id: str) -> List[str]:
+        return self.redis.lrange(f"user:{user_id}:chats", 0, -1)
+
+    def chat_belongs_to(self, user_id: str, chat_id: str) -> bool:
+        return self.redis.get(f"chat:{chat_id}:owner") == user_id
+
+    def delete_chat(self, user_id: str, chat_id: str):
+        pipe = self.redis.pipeline()
+        pipe.lrem(f"user:{user_id}:chats", 0, chat_id)
+        pipe.delete(f"chat:{chat_id}:owner", f"chat:{chat_id}:messages")
+        pipe.execute()
+
+    def append_message(self, chat_id: str, role: str, content: str) -> int:
+        return int(self.append_script(keys=[f"chat:{chat_id}:messages", "message_seq"], args=[role, content]))
+
+    def _scan_back(self, chat_id: str, page: int = 50):
+        """Yield messages newest first, reading the list from the tail in pages"""
+        key = f"chat:{chat_id}:messages"
+        end = -1
+        while True:
+            batch = self.redis.lrange(key, end - page + 1, end)
+            for raw in reversed(batch):
+                yield json.loads(raw)
+            if len(batch) < page:
+                return
+            end -= page
+
+    def get_messages(self, chat_id: str, limit: Optional[int] = None, before: Optional[int] = None) -> List[Dict]:
+        if limit is None and before is None:
+            return [json.loads(m) for m in self.redis.lrange(f"chat:{chat_id}:messages", 0, -1)]
+        selected = []
+        for message in self._scan_back(chat_id):
+            if before is not None and message["id"] >= before:
+                continue
+            selected.append(message)
+            if limit is not None and len(selected) >= limit:
+                break
+        return selected[::-1]
+
+    def get_messages_since(self, chat_id: str, after: int, limit: Optional[int] = None) -> List[Dict]:
+        newer = []
+        for message in self._scan_back(chat_id):
+            if message["id"] <= after:
+                break
+            newer.append(message)
+        newer.reverse()
+        return newer if limit is None else newer[:limit]
+
+    def chat_version(self, chat_id: str) -> Tuple[int, int]:
+        key = f"chat:{chat_id}:messages"
+        pipe = self.redis.pipeline()
+        pipe.llen(key)
+        pipe.lindex(key, -1)
+        count, last = pipe.execute()
+        return count, json.loads(last)["id"] if last else 0
+
+    def import_chats(self, chats: Dict[str, List[Dict]]) -> Optional[str]:
+        if not self.redis.set("legacy_chats_imported", 1, nx=True):
+            return None
+        user_id = self.create_user()
+        for chat_id, messages in chats.items():
+            self.add_chat(user_id, chat_id)
+            for m in messages:
+                self.append_message(chat_id, m["role"], m["content"])
+        return user_id
+
+
+def open_session_store(url: str = SESSION_STORE_URL) -> SessionStore:
+    """Build the backend named by the URL scheme"""
+    if url.startswith("sqlite:///"):
+        return SQLiteSessionStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSessionStore(url)
+    raise ValueError(f"Unsupported SESSION_STORE_URL: {url}")
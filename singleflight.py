@@ -0,0 +1,72 @@
+import threading
+from typing import Callable, Hashable
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive form used in single-flight keys"""
+    return " ".join((text or "").lower().split())
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls into one execution.
+
+    The first caller for a key runs the function; callers that arrive while it
+    is in flight block and receive the same result (or exception). Nothing is
+    cached after the call completes. Results are shared, so treat them as
+    read-only.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self.calls[key] = call
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self.lock:
+            in_flight = len(self.calls)
+        total = self.executed + self.shared
+        return {
+            "executed": self.executed,
+            "shared": self.shared,
+            "dedup_rate": self.shared / total if total else 0.0,
+            "in_flight": in_flight,
+        }
@@ -0,0 +1,323 @@
+import asyncio
+import hashlib
+import os
+import struct
+import threading
+import time
+import uuid
+import wave
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+STT_MAX_UPLOAD_BYTES = int(float(os.environ.get("STT_MAX_UPLOAD_MB", "10")) * 1024 * 1024)
+STT_CHUNK_SIZE = 64 * 1024
+# Room for the multipart boundaries and part headers around the audio
+STT_MULTIPART_OVERHEAD = 16 * 1024
+STT_WORKERS = int(os.environ.get("STT_WORKERS", "4"))
+STT_CACHE_SIZE = int(os.environ.get("STT_CACHE_SIZE", "256"))
+
+TTS_CACHE_MAX_BYTES = int(float(os.environ.get("TTS_CACHE_MAX_MB", "200")) * 1024 * 1024)
+TTS_WORKERS = int(os.environ.get("TTS_WORKERS", "4"))
+TTS_DEFAULT_VOICE = os.environ.get("TTS_VOICE", "Charon")
+# Partial files untouched this long were left by a crashed worker; younger ones
+# may still be written by another worker sharing the directory
+TTS_PARTIAL_MAX_AGE = float(os.environ.get("TTS_PARTIAL_MAX_AGE_S", "600"))
+# Gemini TTS returns 24 kHz, 16-bit mono PCM
+TTS_RATE = 24000
+TTS_CHANNELS = 1
+TTS_SAMPLE_WIDTH = 2
+
+
+class AudioTooLarge(Exception):
+    """Raised when an upload exceeds the configured size cap"""
+
+
+@dataclass
+class AudioUpload:
+    data: bytes
+    mime_type: str
+    digest: str
+
+
+def base_mime_type(content_type: Optional[str]) -> str:
+    """'audio/webm;codecs=opus' -> 'audio/webm'"""
+    return (content_type or "").split(";")[0].strip().lower()
+
+
+def limit_body(request, max_bytes: int = STT_MAX_UPLOAD_BYTES + STT_MULTIPART_OVERHEAD):
+    """
+    Request whose body raises AudioTooLarge as soon as more than max_bytes
+    arrive. A Content-Length over the cap is rejected before anything is read.
+    """
+    from starlette.requests import Request
+
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise AudioTooLarge(f"Request is {length} bytes, limit is {max_bytes}")
+
+    received = 0
+
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > max_bytes:
+                raise AudioTooLarge(f"Request exceeds limit of {max_bytes} bytes")
+        return message
+
+    return Request(request.scope, receive)
+
+
+async def read_upload(file, max_bytes: int = STT_MAX_UPLOAD_BYTES, chunk_size: int = STT_CHUNK_SIZE) -> AudioUpload:
+    """Hash a spooled UploadFile in chunks, then read it into memory once"""
+    size = getattr(file, "size", None)
+    if size is not None and size > max_bytes:
+        raise AudioTooLarge(f"Audio file is {size} bytes, limit is {max_bytes}")
+
+    hasher = hashlib.sha256()
+    total = 0
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise AudioTooLarge(f"Audio file exceeds limit of {max_bytes} bytes")
+        hasher.update(chunk)
+
+    await file.seek(0)
+    data = await file.read(total)
+    return AudioUpload(data=data, mime_type=base_mime_type(file.content_type), digest=hasher.hexdigest())
+
+
+class LazySearcher:
+    """One HybridSearcher shared by a worker pool, created on first use"""
+
+    def __init__(self, factory: Callable):
+        self.factory = factory
+        self.instance = None
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            if self.instance is None:
+                self.instance = self.factory()
+        return self.instance
+
+
+class Transcriber:
+    """
+    Runs speech-to-text on a bounded thread pool and caches transcripts by
+    audio content hash. Concurrent requests for the same audio share one call.
+    """
+
+    def __init__(self, searcher_factory: Callable, workers: int = STT_WORKERS, cache_size: int = STT_CACHE_SIZE):
+        self.searcher = LazySearcher(searcher_factory)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stt")
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.in_flight = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _send_audio(self, data: bytes, mime_type: str) -> str:
+        return self.searcher().send_audio(data, mime_type)
+
+    def _remember(self, key: str, transcript: str):
+        self.cache[key] = transcript
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    async def transcribe(self, upload: AudioUpload) -> str:
+        key = f"{upload.mime_type}:{upload.digest}"
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        if key in self.in_flight:
+            self.hits += 1
+            return await asyncio.shield(self.in_flight[key])
+
+        self.misses += 1
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, self._send_audio, upload.data, upload.mime_type)
+        self.in_flight[key] = future
+        try:
+            transcript = await asyncio.shield(future)
+        finally:
+            self.in_flight.pop(key, None)
+
+        # Empty transcripts are not cached so a retry gets another attempt
+        if transcript:
+            self._remember(key, transcript)
+        return transcript
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "cache_entries": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "in_flight": len(self.in_flight),
+        }
+
+
+def streaming_wav_header(rate: int = TTS_RATE, channels: int = TTS_CHANNELS, sample_width: int = TTS_SAMPLE_WIDTH) -> bytes:
+    """WAV header with unknown length, so PCM can follow as it is generated"""
+    unknown = 0xFFFFFFFF
+    return b"".join([
+        b"RIFF", struct.pack("<I", unknown), b"WAVE",
+        b"fmt ", struct.pack("<IHHIIHH", 16, 1, channels, rate,
+                             rate * channels * sample_width, channels * sample_width, sample_width * 8),
+        b"data", struct.pack("<I", unknown),
+    ])
+
+
+class TTSStore:
+    """
+    Content-addressed TTS cache in the uploads directory.
+
+    Files are named tts_<sha256(voice, text)>.wav. Hits are served from disk;
+    misses are streamed to the client as PCM arrives and written to the cache
+    once complete. The directory is kept under max_bytes by evicting the
+    least recently used files (mtime is refreshed on every hit).
+    """
+
+    def __init__(self, directory: str, searcher_factory: Callable,
+                 max_bytes: int = TTS_CACHE_MAX_BYTES, workers: int = TTS_WORKERS):
+        self.directory = directory
+        self.searcher = LazySearcher(searcher_factory)
+        self.max_bytes = max_bytes
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts")
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._remove_partials()
+        self.evict()
+
+    @staticmethod
+    def key(text: str, voice: str) -> str:
+        return hashlib.sha256(f"{voice}\0{text}".encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"tts_{key}.wav")
+
+    def lookup(self, text: str, voice: str = TTS_DEFAULT_VOICE) -> Optional[str]:
+        """Path of the cached WAV for this text and voice, or None"""
+        path = self.path(self.key(text, voice))
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        self.hits += 1
+        return path
+
+    async def stream(self, text: str, voice: str = TTS_DEFAULT_VOICE):
+        """Yield a WAV byte stream, caching the audio on disk once it completes"""
+        self.misses += 1
+        final_path = self.path(self.key(text, voice))
+        part_path = f"{final_path}.{uuid.uuid4().hex}.part"
+        wf = wave.open(part_path, "wb")
+        wf.setnchannels(TTS_CHANNELS)
+        wf.setsampwidth(TTS_SAMPLE_WIDTH)
+        wf.setframerate(TTS_RATE)
+        completed = False
+        try:
+            header_sent = False
+            async for pcm in self._pcm(text, voice):
+                wf.writeframes(pcm)
+                if not header_sent:
+                    header_sent = True
+                    yield streaming_wav_header() + pcm
+                else:
+                    yield pcm
+            if not header_sent:
+                raise RuntimeError("TTS returned no audio")
+            completed = True
+        finally:
+            wf.close()
+            if completed:
+                os.replace(part_path, final_path)
+                self.evict()
+            else:
+                os.remove(part_path)
+
+    async def _pcm(self, text: str, voice: str):
+        """Run the blocking tts_stream generator on the pool and relay its chunks"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        done = object()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for pcm in self.searcher().tts_stream(text, voice):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, pcm)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        loop.run_in_executor(self.executor, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Client went away or an error occurred: let the worker stop early
+            stop.set()
+
+    def evict(self):
+        """Delete least recently used cached files until the directory fits max_bytes"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not (name.startswith("tts_") and name.endswith(".wav")):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _remove_partials(self, max_age: float = TTS_PARTIAL_MAX_AGE):
+        """Delete stale .part files; each write refreshes mtime, so live streams are kept"""
+        cutoff = time.time() - max_age
+        for name in os.listdir(self.directory):
+            if name.startswith("tts_") and name.endswith(".part"):
+                path = os.path.join(self.directory, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -1,26 +1,93 @@
 import google.generativeai as genai  
-#from google.genai import types
+from google.genai import types
 from qdrant_client import QdrantClient, models
+import asyncio
 import json
 import wave
 from typing import List
 import uuid
 import os
 from dotenv import load_dotenv
+from context_manager import ContextManager
+from singleflight import SingleFlight, normalize_query
+from llm_scheduler import scheduler
+from schema import DOCS_SCHEMA, CollectionSchema
+from vector_profiles import profile_for
+from reranker import Reranker
+from embedding_models import DENSE_MODEL, MODEL_OPTIONS, SPARSE_MODEL
 
 load_dotenv()
 api_key = os.environ.get("GENAI_KEY")
 client = genai.GenerativeModel("gemini-1.5-flash")
 
+# One Qdrant client per process. fastembed models used for query inference are
+# cached on the client, so sharing it means they load (and warm up) only once.
+qdrant = QdrantClient()
+
+# Identical filter/retrieval calls in flight at the same time (across all
+# sessions in this process) share one execution
+flights = SingleFlight()
+
+_MISSING = object()
+
+
+class Projection:
+    """Column names of a collection's projected payload and their positions, built once per collection"""
+    __slots__ = ("names", "positions")
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.positions = {name: i for i, name in enumerate(self.names)}
+
+
+class MetadataRecord:
+    """Read-only projected payload. The Projection is shared per collection, values are per point."""
+    __slots__ = ("columns", "values")
+
+    def __init__(self, columns: Projection, values: tuple):
+        self.columns = columns
+        self.values = values
+
+    def items(self):
+        return ((k, v) for k, v in zip(self.columns.names, self.values) if v is not _MISSING)
+
+    def keys(self):
+        return [k for k, _ in self.items()]
+
+    def get(self, key, default=None):
+        position = self.columns.positions.get(key)
+        if position is None:
+            return default
+        value = self.values[position]
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def to_dict(self) -> dict:
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"MetadataRecord({self.to_dict()!r})"
+
 
 class HybridSearcher:
-    DENSE_MODEL = "BAAI/bge-base-en-v1.5"
-    SPARSE_MODEL = "prithivida/Splade_PP_en_v1"
-    options = {"cache_dir": "./models"}
+    DENSE_MODEL = DENSE_MODEL
+    SPARSE_MODEL = SPARSE_MODEL
+    options = MODEL_OPTIONS
     bp_prompt = """
     - format - KEYWORD ['Website' 'Document' 'Video' 'Multiple']
     - district - TEXT
-    - year - DATETIME
+    - year - INTEGER
     - continent - TEXT ['Asia' 'Africa' 'Multiple' 'South America' 'Australia' 'Europe' 'North America' nan]
     - brief_description - TEXT
     - state - TEXT ['UTTARAKHAND', 'PAN-INDIA', 'UTTAR PRADESH', 'BIHAR', 'PUDUCHERRY', 'ARUNACHAL PRADESH', 'ASSAM', 'THE DADRA AND NAGAR HAVELI AND DAMAN AND DIU', 'GUJARAT', 'SIKKIM', 'HIMACHAL PRADESH', 'JHARKHAND', 'TRIPURA', 'JAMMU & KASHMIR', 'MIZORAM', 'HARYANA', 'PUNJAB', 'GOA', 'ODISHA', 'LAKSHADWEEP', 'KARNATAKA', 'NAGALAND', 'MULTIPLE STATES', 'KERALA', 'MANIPUR', 'ANDHRA PRADESH', 'MAHARASHTRA', 'TELANGANA', 'DELHI', 'MEGHALAYA', 'LADAKH', 'RAJASTHAN', 'LEH', 'CHANDIGARH', 'CHHATTISGARH', 'TAMIL NADU', 'MADHYA PRADESH', 'WEST BENGAL', 'ANDAMAN AND NICOBAR ISLANDS']
@@ -109,9 +176,29 @@ class HybridSearcher:
     "doc_id"
 ]
 
+    # Payload projections, computed once. Qdrant only sends these fields back
+    # and results are stored as MetadataRecord sharing the column tuple.
+    bp_projection = Projection(bp_columns)
+    pol_projection = Projection(pol_columns)
+    bp_payload = models.PayloadSelectorInclude(include=list(bp_columns))
+    pol_payload = models.PayloadSelectorInclude(include=list(pol_columns))
+    # Bookkeeping written by ingest.py, never useful as context
+    full_payload = models.PayloadSelectorExclude(exclude=["ingest_key", "content_hash"])
+
+    # Filterable fields and their payload indexes (see schema.py)
+    schemas = {
+        "best_practices": CollectionSchema.from_prompt("best_practices", bp_prompt, bp_columns),
+        "policies": CollectionSchema.from_prompt("policies", pol_prompt, pol_columns),
+        "docs": DOCS_SCHEMA,
+    }
+
+    # Dense search settings (ef, quantization rescoring) for the profile each
+    # collection was configured with (see vector_profiles.py)
+    dense_params = {name: profile_for(name).search_params() for name in ("best_practices", "policies", "data", "docs")}
+
 
     def __init__(self):
-        self.qdrant_client = QdrantClient()
+        self.qdrant_client = qdrant
         self.client = genai
         self.active_chat = None
         self.chat_history = {}  # Store chat instances by ID
@@ -167,15 +254,41 @@ class HybridSearcher:
         system_instruction = "You are an assistant that helps users interact with NITI Aayog's NITI For States platform. You will be provided the relevant information in the context. Answer only in the language of the original query. Limit your answers to the context. If the context is not sufficient, say so. Do not answer from outside the context. If listing practices and policies, briefly describe them as well. Provide sources and links for any text you use. Link the source beneath the referenced text with the label 'Source'."
         tools = types.Tool(function_declarations=[search_function, qna_function])
         self.config = types.GenerateContentConfig(system_instruction=system_instruction,tools=[tools])
+        self.context = ContextManager(self.client)
         self.active_chat = self.create_new_chat()
 
-    def create_new_chat(self) -> str:
-        """Creates a new chat and returns its ID"""
+    def create_new_chat(self, history: list = None) -> str:
+        """Creates a new chat and returns its ID. `history` seeds it with stored {role, content} messages."""
         chat_id = str(uuid.uuid4())
-        self.chat_history[chat_id] = self.client.chats.create(model="gemini-2.0-flash", config=self.config)
+        contents = [
+            types.Content(role="model" if m["role"] == "assistant" else "user", parts=[types.Part(text=m["content"])])
+            for m in history or []
+            if m.get("content")
+        ]
+        self.chat_history[chat_id] = self.client.chats.create(model="gemini-2.0-flash", config=self.config, history=contents)
         self.active_chat = chat_id
         return chat_id
 
+    def compact_chat(self, chat_id: str = None):
+        """Rewrite a chat's history so it stays bounded (see context_manager.py)"""
+        chat_id = chat_id or self.active_chat
+        chat = self.chat_history.get(chat_id)
+        if chat is None:
+            return
+        try:
+            history = self.context.compact(chat_id, chat.get_history())
+            if history is not None:
+                self.chat_history[chat_id] = self.client.chats.create(model="gemini-2.0-flash", config=self.config, history=history)
+        except Exception as e:
+            print(f"[ERROR] Compacting chat {chat_id} failed: {str(e)}")
+
+    def drop_chats(self):
+        """Remove every chat along with its context bookkeeping"""
+        for chat_id in list(self.chat_history):
+            self.context.forget(chat_id)
+        self.chat_history.clear()
+        self.active_chat = None
+
     def switch_chat(self, chat_id: str) -> bool:
         """Switch to an existing chat session"""
         if chat_id in self.chat_history:
@@ -276,7 +389,9 @@ class HybridSearcher:
 
         """
 
-        response = self.client.models.generate_content(
+        response = scheduler.call(
+            "gemini-2.0-flash",
+            self.client.models.generate_content,
             model="gemini-2.0-flash",
             contents=prompt,
             config={
@@ -304,8 +419,22 @@ class HybridSearcher:
     
     
     def search_metadata(self, text: str, collection_name: str, filter: dict = None, n: int = 5):           
-        if filter is not None:
+        # Generated filters only reach Qdrant on declared, indexed fields
+        schema = self.schemas.get(collection_name)
+        if schema is not None:
+            filter = schema.sanitize(filter)
+        elif filter:
             filter = models.Filter(**filter)
+        else:
+            filter = None
+
+        if collection_name == "data":
+            columns, with_payload = None, self.full_payload
+        elif collection_name == "best_practices":
+            columns, with_payload = self.bp_projection, self.bp_payload
+        else:
+            columns, with_payload = self.pol_projection, self.pol_payload
+
         search_result = self.qdrant_client.query_points(
             collection_name=collection_name,
             query=models.FusionQuery(
@@ -314,7 +443,8 @@ class HybridSearcher:
             prefetch=[
                 models.Prefetch(
                     query=models.Document(text=text, model=self.DENSE_MODEL, options=self.options),
-                    using="dense"
+                    using="dense",
+                    params=self.dense_params.get(collection_name),
                 ),
                 models.Prefetch(
                     query=models.Document(text=text, model=self.SPARSE_MODEL, options=self.options),
@@ -323,24 +453,25 @@ class HybridSearcher:
             ],
             query_filter=filter,  # If you don't want any filters for now
             limit=n,  # 5 the closest results
+            with_payload=with_payload,
         ).points
         # `search_result` contains models.QueryResponse structure
         # We can access list of scored points with the corresponding similarity scores,
         # vectors (if `with_vectors` was set to `True`), and payload via `points` attribute.
 
         # Select and return metadata
+        if columns is None:
+            return [point.payload for point in search_result]
+
+        doc_id_index = columns.positions["doc_id"]
         metadata = []
-        allowed_columns = self.bp_columns if collection_name == "best_practices" else self.pol_columns
+        for point in search_result:
+            payload = point.payload
+            values = [payload.get(k, _MISSING) for k in columns.names]
+            if values[doc_id_index] is _MISSING:
+                values[doc_id_index] = "Document not available in local database."
+            metadata.append(MetadataRecord(columns, tuple(values)))
 
-        if collection_name == "data":
-            metadata = [point.payload for point in search_result]
-        else:
-            for point in search_result:
-                filtered_payload = {k: v for k, v in point.payload.items() if k in allowed_columns}
-                if "doc_id" not in filtered_payload.keys():
-                    filtered_payload["doc_id"] = "Document not available in local database."
-                metadata.append(filtered_payload)
-            
         return metadata
     
     
@@ -366,7 +497,8 @@ class HybridSearcher:
             prefetch=[
                 models.Prefetch(
                     query=models.Document(text=intent, model=self.DENSE_MODEL, options=self.options),
-                    using="dense"
+                    using="dense",
+                    params=self.dense_params["docs"],
                 ),
                 models.Prefetch(
                     query=models.Document(text=intent, model=self.SPARSE_MODEL, options=self.options),
@@ -375,6 +507,7 @@ class HybridSearcher:
             ],
             query_filter=filter,
             limit=n,
+            with_payload=self.full_payload,
         ).points
 
         metadata = [point.payload for point in search_result]
@@ -382,7 +515,9 @@ class HybridSearcher:
  
     def validator(self, docs: list, intent: str, doc_ids: list, n: int = 5):
         text = [doc['text'] for doc in docs]
-        response = client.models.generate_content(
+        response = scheduler.call(
+            "gemini-2.0-flash",
+            client.models.generate_content,
             model="gemini-2.0-flash",
             contents="Validate the following documents for the query: " + intent + "\n" + str(text),
             config={
@@ -406,6 +541,18 @@ class HybridSearcher:
         context += "</documents>\n"
         return context
 
+    def shared_filter(self, query: str, collection_name: str, field_prompt: str):
+        key = ("filter", collection_name, normalize_query(query))
+        return flights.do(key, self.create_filter, query, field_prompt)
+
+    def shared_search_metadata(self, text: str, collection_name: str, filter: dict = None, n: int = 5):
+        key = ("metadata", collection_name, normalize_query(text), json.dumps(filter, sort_keys=True, default=str), n)
+        return flights.do(key, self.search_metadata, text, collection_name, filter, n)
+
+    def shared_search_docs(self, intent: str, doc_ids: list = None, n: int = 10):
+        key = ("docs", normalize_query(intent), tuple(doc_ids) if doc_ids is not None else None, n)
+        return flights.do(key, self.search_docs, intent, doc_ids, n)
+
     def search(self, formatted_query: str, collections: List[str], mode: str, n: int = 5):
         """
         Search across any combination of collections.
@@ -416,36 +563,41 @@ class HybridSearcher:
         for collection_name in collections:
             if collection_name != "data":
                 prompt = self.bp_prompt if collection_name == "best_practices" else self.pol_prompt
-                output = self.create_filter(formatted_query, prompt)
+                output = self.shared_filter(formatted_query, collection_name, prompt)
                 output_map[collection_name] = output
-                docs += self.search_metadata(output['vector_string'], collection_name, output['filter'], n)
+                docs += self.shared_search_metadata(output['vector_string'], collection_name, output['filter'], n)
             else:
                 print("[DEBUG] data collection")
                 prompt = ""
-                output = self.create_filter(formatted_query, prompt)
+                output = self.shared_filter(formatted_query, collection_name, prompt)
                 output_map[collection_name] = output
-                data += self.search_metadata(output['vector_string'], collection_name, None, 5)
+                data += self.shared_search_metadata(output['vector_string'], collection_name, None, 5)
 
         print(f"[DEBUG] {docs}\n{data}")
 
         if mode == "qna":
             doc_ids = [doc["doc_id"] for doc in docs]
             # Use the vector_string from the first collection for QnA context
-            metadata = self.search_docs(output_map[collections[0]]['vector_string'], doc_ids, 50)
+            metadata = self.shared_search_docs(output_map[collections[0]]['vector_string'], doc_ids, 50)
+            if reranker.enabled:
+                # Only the best chunks go into the prompt (see reranker.py)
+                metadata = reranker.rerank(formatted_query, metadata)
             context = self.docs_to_context(metadata, data)
         else:
             print(f"[DEBUG] docs: {docs}")
             context = self.docs_to_context(docs, data)
         return context
 
-    def send_audio(self, audio_bytes: bytes):
-        response = self.client.models.generate_content(
+    def send_audio(self, audio_bytes: bytes, mime_type: str = "audio/webm"):
+        response = scheduler.call(
+        'gemini-2.0-flash',
+        self.client.models.generate_content,
         model='gemini-2.0-flash',
         contents=[
             'Respond with only the transcription of the audio file.',
             types.Part.from_bytes(
             data=audio_bytes,
-            mime_type='audio/webm',
+            mime_type=mime_type,
             )
         ]
         )
@@ -462,7 +614,9 @@ class HybridSearcher:
                 active_chat = self.get_active_chat()
 
             # Send initial message to get function calls
-            response = active_chat.send_message(query)
+            # Blocking Gemini/Qdrant calls run in threads so concurrent requests
+            # overlap (and identical retrievals can be shared)
+            response = await asyncio.to_thread(scheduler.call, "gemini-2.0-flash", active_chat.send_message, query)
             print(f"[DEBUG] Initial response: {response}")
 
             print(response.function_calls)
@@ -472,7 +626,8 @@ class HybridSearcher:
                     print(f"[DEBUG] Function call detected: {call.name}")
                     if call.name == 'search_documents':
                         print(f"[DEBUG] Call Args: {call.args}")
-                        context = self.search(
+                        context = await asyncio.to_thread(
+                            self.search,
                             call.args["formatted_query"],
                             collections,
                             call.args["mode"],
@@ -481,13 +636,13 @@ class HybridSearcher:
                         response_parts.append(
                             types.Part.from_function_response(name=call.name, response={"result": context}))
                     elif call.name == "search_content":
-                        context = self.search_docs(**call.args)
+                        context = await asyncio.to_thread(self.shared_search_docs, **call.args)
                         response_parts.append(
                             types.Part.from_function_response(name=call.name, response={"result": context}))
 
                 print(context)
                 # Get streaming response with context
-                for chunk in active_chat.send_message_stream(response_parts):
+                async for chunk in scheduler.stream_async("gemini-2.0-flash", active_chat.send_message_stream, response_parts):
                     print(f"[DEBUG] Streaming chunk: {chunk.text}", end='')
                     yield chunk
             else:
@@ -495,12 +650,42 @@ class HybridSearcher:
                 print(f"[DEBUG] Direct response: {response.text}", end='')
                 yield response
 
+            # Keep the next turn's prompt small: old tool results become doc_id references
+            self.compact_chat()
+
         except Exception as e:
             print(f"[ERROR] Error in process_query: {str(e)}")
             yield {"text": f"An error occurred: {str(e)}"}
         
     
-    def tts(self, message, file_name):
+    def tts_config(self, voice_name: str = "Charon"):
+        return types.GenerateContentConfig(
+            response_modalities=["AUDIO"],
+            speech_config=types.SpeechConfig(
+                voice_config=types.VoiceConfig(
+                    prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                        voice_name=voice_name,
+                    )
+                )
+            ),
+        )
+
+    def tts_stream(self, message, voice_name: str = "Charon"):
+        """Yield raw PCM (24 kHz, 16-bit mono) chunks as Gemini produces them"""
+        for chunk in scheduler.stream(
+            "gemini-2.5-flash-preview-tts",
+            client.models.generate_content_stream,
+            model="gemini-2.5-flash-preview-tts",
+            contents=message,
+            config=self.tts_config(voice_name),
+        ):
+            if not chunk.candidates or not chunk.candidates[0].content:
+                continue
+            for part in chunk.candidates[0].content.parts:
+                if part.inline_data and part.inline_data.data:
+                    yield part.inline_data.data
+
+    def tts(self, message, file_name, voice_name: str = "Charon"):
         def wave_file(filename, pcm, channels=1, rate=24000, sample_width=2):
             with wave.open(filename, "wb") as wf:
                 wf.setnchannels(channels)
@@ -508,21 +693,18 @@ class HybridSearcher:
                 wf.setframerate(rate)
                 wf.writeframes(pcm)
 
-        response = client.models.generate_content(
+        response = scheduler.call(
+            "gemini-2.5-flash-preview-tts",
+            client.models.generate_content,
             model="gemini-2.5-flash-preview-tts",
             contents=message,
-            config=types.GenerateContentConfig(
-                response_modalities=["AUDIO"],
-                speech_config=types.SpeechConfig(
-                    voice_config=types.VoiceConfig(
-                        prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                            voice_name='Charon',
-                        )
-                    )
-                ),
-            )
+            config=self.tts_config(voice_name)
         )
 
         data = response.candidates[0].content.parts[0].inline_data.data
         wave_file(file_name, data) # Saves the file to current directory
         return file_name
+
+
+# Cross-encoder for qna context, sharing the embedding models' cache dir and threads
+reranker = Reranker(model_options=HybridSearcher.options)
@@ -0,0 +1,41 @@
+"""
+Smoke test for benchmarks/stub_server.py: it replaces test.py with a stub
+searcher, so server.py must import without touching attributes only the real
+HybridSearcher has. benchmarks/load_test.py and import_profile depend on it.
+"""
+import asyncio
+import importlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+pytest.importorskip("fastapi")
+pytest.importorskip("qdrant_client")
+
+
+@pytest.fixture
+def stub_server(tmp_path, monkeypatch):
+    # server.py creates uploads/ and the SQLite session store on import
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SESSION_STORE_URL", f"sqlite:///{tmp_path / 'sessions.db'}")
+    monkeypatch.setenv("WARMUP", "0")
+    for name in ("benchmarks.stub_server", "server", "test", "session_store", "warmup", "evaluation.metrics"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    return importlib.import_module("benchmarks.stub_server")
+
+
+def test_stub_server_imports(stub_server):
+    assert stub_server.app is not None
+
+
+def test_stub_searcher_streams_text_chunks(stub_server):
+    async def collect():
+        return [chunk async for chunk in stub_server.StubHybridSearcher().process_query("q", ["policies"])]
+
+    chunks = asyncio.run(collect())
+    assert chunks and all(isinstance(chunk.text, str) for chunk in chunks)
@@ -0,0 +1,123 @@
+"""
+Storage/search tuning profiles for the dense vectors of a collection.
+
+A profile bundles quantization (scalar int8 or binary, searched with
+rescoring against the original vectors), whether the original float32
+vectors and the HNSW graph live on disk, the HNSW build parameters
+(m, ef_construct) and the search-time ef.
+
+    python vector_profiles.py docs scalar        # apply a profile to an existing collection
+    python vector_profiles.py --list
+
+Search-time settings follow the profile named in VECTOR_PROFILE_<COLLECTION>
+(e.g. VECTOR_PROFILE_DOCS=scalar) or VECTOR_PROFILE, default "baseline".
+Set it to the profile applied to the collection. Compare profiles with
+benchmarks/vector_profiles_bench.py.
+"""
+import argparse
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from qdrant_client import models
+
+DENSE_VECTOR = "dense"
+
+
+@dataclass(frozen=True)
+class VectorProfile:
+    name: str
+    description: str
+    quantization: Optional[str] = None  # None, "scalar" or "binary"
+    on_disk: bool = False  # original vectors on disk (quantized copies stay in RAM)
+    hnsw_on_disk: bool = False
+    m: int = 16
+    ef_construct: int = 100
+    ef: Optional[int] = None  # search-time ef; None uses Qdrant's default
+    oversampling: float = 1.0  # candidates fetched from quantized vectors per result, then rescored
+
+    def quantization_config(self):
+        if self.quantization == "scalar":
+            return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8, quantile=0.99, always_ram=True,
+            ))
+        if self.quantization == "binary":
+            return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def hnsw_config(self) -> models.HnswConfigDiff:
+        return models.HnswConfigDiff(m=self.m, ef_construct=self.ef_construct, on_disk=self.hnsw_on_disk)
+
+    def vector_params(self, size: int) -> models.VectorParams:
+        """Dense vector config for a new collection"""
+        return models.VectorParams(size=size, distance=models.Distance.COSINE, on_disk=self.on_disk)
+
+    def search_params(self) -> Optional[models.SearchParams]:
+        if self.quantization is None and self.ef is None:
+            return None
+        quantization = None
+        if self.quantization is not None:
+            quantization = models.QuantizationSearchParams(rescore=True, oversampling=self.oversampling)
+        return models.SearchParams(hnsw_ef=self.ef, quantization=quantization)
+
+    def estimated_ram_bytes(self, points: int, dim: int) -> int:
+        """Rough resident size of the dense vectors and HNSW links for `points` vectors"""
+        originals = 0 if self.on_disk else points * dim * 4
+        quantized = {"scalar": points * dim, "binary": points * dim // 8}.get(self.quantization, 0)
+        links = 0 if self.hnsw_on_disk else points * self.m * 2 * 4
+        return originals + quantized + links
+
+
+PROFILES = {p.name: p for p in [
+    VectorProfile("baseline", "float32 vectors and HNSW graph in RAM, Qdrant defaults"),
+    VectorProfile("scalar", "int8 scalar quantization in RAM, originals on disk, rescored",
+                  quantization="scalar", on_disk=True, ef=128, oversampling=2.0),
+    VectorProfile("binary", "1-bit binary quantization in RAM, originals on disk, rescored",
+                  quantization="binary", on_disk=True, ef=128, oversampling=3.0),
+    VectorProfile("low_memory", "scalar quantization with originals and HNSW graph on disk, sparser graph",
+                  quantization="scalar", on_disk=True, hnsw_on_disk=True, m=8, ef_construct=64, ef=128,
+                  oversampling=2.0),
+    VectorProfile("high_recall", "float32 in RAM with a denser graph and wider search",
+                  m=32, ef_construct=256, ef=256),
+]}
+
+
+def profile_for(collection_name: str) -> VectorProfile:
+    """Profile configured for a collection through the environment"""
+    name = os.environ.get(f"VECTOR_PROFILE_{collection_name.upper()}", os.environ.get("VECTOR_PROFILE", "baseline"))
+    if name not in PROFILES:
+        raise ValueError(f"Unknown vector profile '{name}' for {collection_name}; choose from {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+
+def apply_profile(client, collection_name: str, profile: VectorProfile):
+    """Reconfigure an existing collection; Qdrant rebuilds quantized data and the graph in the background"""
+    quantization = profile.quantization_config()
+    client.update_collection(
+        collection_name=collection_name,
+        vectors_config={DENSE_VECTOR: models.VectorParamsDiff(on_disk=profile.on_disk)},
+        hnsw_config=profile.hnsw_config(),
+        quantization_config=quantization if quantization is not None else models.Disabled.DISABLED,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a vector storage profile to a Qdrant collection")
+    parser.add_argument("collection", nargs="?")
+    parser.add_argument("profile", nargs="?", choices=sorted(PROFILES))
+    parser.add_argument("--list", action="store_true", help="Show the available profiles")
+    args = parser.parse_args()
+
+    if args.list or not (args.collection and args.profile):
+        for profile in PROFILES.values():
+            print(f"{profile.name:<12} {profile.description}")
+        return
+
+    from test import qdrant
+    apply_profile(qdrant, args.collection, PROFILES[args.profile])
+    print(f"Applied '{args.profile}' to {args.collection}. "
+          f"Set VECTOR_PROFILE_{args.collection.upper()}={args.profile} for the server.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, List, Tuple
+
+WARMUP_ENABLED = os.environ.get("WARMUP", "1") != "0"
+# Collection used to exercise the dense + sparse embedding path end to end
+WARMUP_COLLECTION = os.environ.get("WARMUP_COLLECTION", "best_practices")
+# MiniLM is only needed by /api/evaluate, so it is opt-in
+WARMUP_EVAL_MODEL = os.environ.get("WARMUP_EVAL_MODEL", "0") == "1"
+# A failing step (Qdrant not up yet, model download hiccup) is retried with
+# exponential backoff before warm-up is reported as failed
+WARMUP_RETRIES = int(os.environ.get("WARMUP_RETRIES", "5"))
+WARMUP_BACKOFF = float(os.environ.get("WARMUP_BACKOFF", "2"))
+WARMUP_MAX_BACKOFF = float(os.environ.get("WARMUP_MAX_BACKOFF", "60"))
+
+
+class WarmupState:
+    """Tracks startup warm-up so /api/ready only reports ready once models are hot"""
+
+    def __init__(self):
+        self.status = "pending"
+        self.steps = {}
+        self.error = None
+        self.retries = 0
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "steps": self.steps,
+            "error": self.error,
+            "retries": self.retries,
+            "duration_s": (self.finished_at - self.started_at) if self.finished_at else None,
+        }
+
+
+async def run_warmup(state: WarmupState, steps: List[Tuple[str, Callable[[], Awaitable]]],
+                     retries: int = WARMUP_RETRIES, backoff: float = WARMUP_BACKOFF):
+    """Run each warm-up step in order, retrying failures, and record how long each took"""
+    state.status = "warming"
+    state.started_at = time.perf_counter()
+    try:
+        for name, step in steps:
+            started = time.perf_counter()
+            for attempt in range(retries + 1):
+                try:
+                    await step()
+                    break
+                except Exception as e:
+                    state.error = f"{name}: {str(e)}"
+                    if attempt == retries:
+                        raise
+                    state.retries += 1
+                    delay = min(backoff * 2 ** attempt, WARMUP_MAX_BACKOFF)
+                    print(f"[WARMUP] {name} failed ({str(e)}), retrying in {delay:.0f}s")
+                    await asyncio.sleep(delay)
+            state.steps[name] = round(time.perf_counter() - started, 3)
+            print(f"[WARMUP] {name} ready in {state.steps[name]:.2f}s")
+        state.status = "ready"
+        state.error = None
+    except Exception:
+        state.status = "failed"
+        print(f"[WARMUP] failed after {retries} retries: {state.error}")
+    finally:
+        state.finished_at = time.perf_counter()
+
+
+def retrieval_step(searcher_factory: Callable, collection_name: str = WARMUP_COLLECTION):
+    """Load the dense and sparse ONNX models with a dummy hybrid query"""
+    async def step():
+        def query():
+            searcher = searcher_factory()
+            searcher.search_metadata("warm up", collection_name, None, 1)
+        await asyncio.to_thread(query)
+    return step
+
+
+def rerank_step(reranker):
+    """Load the cross-encoder by scoring one dummy pair"""
+    async def step():
+        await asyncio.to_thread(reranker.scores, "warm up", ["warm up"])
+    return step